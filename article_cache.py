@@ -0,0 +1,57 @@
+"""Persistent cache of parsed article metadata for the scraped sources.
+
+Caravan and EPW read each article page only to pull a handful of metadata
+fields, which rarely change once the article is published. Entries are keyed
+by article path and expire after a TTL so corrections are eventually picked up.
+Pages with no article metadata, such as a bot challenge or maintenance page,
+expire after MISS_TTL instead, so a new article is picked up on a later run.
+"""
+
+import os
+import time
+
+import state
+
+TTL = float(os.environ.get("ARTICLE_CACHE_TTL_HOURS", "168")) * 3600
+MISS_TTL = float(os.environ.get("ARTICLE_CACHE_MISS_TTL_HOURS", "1")) * 3600
+MAX_ENTRIES = int(os.environ.get("ARTICLE_CACHE_MAX_ENTRIES", "500"))
+
+# Returned by ArticleCache.get when a path has to be fetched
+MISSING = object()
+
+
+class ArticleCache:
+    def __init__(self, name, ttl=TTL, miss_ttl=MISS_TTL, max_entries=MAX_ENTRIES):
+        self.name = name
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.max_entries = max_entries
+        self.entries = state.load_json(name, {})
+        self.hits = 0
+
+    def get(self, path):
+        """Return the cached metadata for ``path`` (possibly None for pages
+        that are not articles), or MISSING if it is absent or expired."""
+        entry = self.entries.get(path)
+        if not entry or self._expired(entry, time.time()):
+            return MISSING
+        self.hits += 1
+        return entry["meta"]
+
+    def put(self, path, meta):
+        self.entries[path] = {"meta": meta, "fetched": time.time()}
+
+    def _expired(self, entry, now):
+        ttl = self.ttl if entry["meta"] is not None else self.miss_ttl
+        return now - entry["fetched"] > ttl
+
+    def save(self):
+        now = time.time()
+        fresh = [
+            (path, entry)
+            for path, entry in self.entries.items()
+            if not self._expired(entry, now)
+        ]
+        fresh.sort(key=lambda item: item[1]["fetched"], reverse=True)
+        self.entries = dict(fresh[: self.max_entries])
+        state.save_json(self.name, self.entries)
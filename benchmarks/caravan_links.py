@@ -0,0 +1,94 @@
+"""Compare the Caravan homepage link extractor with the original regex.
+
+Builds synthetic homepages of increasing size, made of article cards and
+link-heavy navigation blocks with no heading after them. Checks that both
+extractors return the same paths, including when the page is fed in small
+chunks, and times them. The parser's time per KB stays flat as pages grow.
+The regex's grows, because every link it can't pair rescans the rest of the
+page. Pass saved homepages to check them too:
+
+    python benchmarks/caravan_links.py [homepage.html ...]
+"""
+
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from generate_caravan_feed import SKIP_PREFIXES, extract_article_urls  # noqa: E402
+
+
+def fetch_article_urls_legacy(page):
+    pattern = r'<a[^>]*href="(/[a-z][^"]+)"[^>]*>.*?<h[1-6][^>]*>(.*?)</h[1-6]>'
+    matches = re.findall(pattern, page, re.DOTALL)
+    seen = set()
+    urls = []
+    for url, _ in matches:
+        if url in seen:
+            continue
+        if any(url.startswith(p) for p in SKIP_PREFIXES):
+            continue
+        parts = url.strip("/").split("/")
+        if len(parts) < 2:
+            continue
+        seen.add(url)
+        urls.append(url)
+    return urls
+
+
+CARDS = [
+    '<div class="card"><a href="/{section}/story-{n}"><img src="/i/{n}.jpg"><h3 class="t">Story {n}</h3></a></div>',
+    '<article><a href="/{section}/story-{n}" class="thumb"><img src="/i/{n}.jpg"></a>'
+    '<h2><a href="/{section}/story-{n}">Story {n} &amp; more</a></h2><p>Summary {n}</p></article>',
+    '<h4><a href="/{section}/story-{n}">Story {n}</a></h4>',
+    '<a href="/pages/about-{n}"><h5>About</h5></a>',
+]
+SECTIONS = ["politics", "culture", "business", "media", "law", "magazine"]
+
+
+def synthetic_page(rng, cards, nav_links):
+    parts = ["<html><head><title>Caravan</title></head><body>"]
+    for n in range(cards):
+        parts.append(rng.choice(CARDS).format(section=rng.choice(SECTIONS), n=n))
+        if n % 10 == 0:
+            parts.append("<nav>" + "".join(f'<a href="/{s}">{s}</a>' for s in SECTIONS) + "</nav>")
+    # Footer full of links with no heading after them
+    parts.append("<footer>")
+    parts.extend(f'<a href="/tag/topic-{i}">Topic {i}</a> ' for i in range(nav_links))
+    parts.append("</footer></body></html>")
+    return "\n".join(parts)
+
+
+def chunked(text, size):
+    return [text[i : i + size] for i in range(0, len(text), size)]
+
+
+def main():
+    rng = random.Random(1)
+    pages = [(path, open(path, encoding="utf-8").read()) for path in sys.argv[1:]]
+    pages += [(f"synthetic {k}x", synthetic_page(rng, 50 * k, 100 * k)) for k in (1, 2, 4, 8, 16)]
+
+    failed = False
+    print(f"{'page':<20} {'KB':>7} {'links':>6} {'regex ms':>9} {'parser ms':>10} {'regex us/KB':>12} {'parser us/KB':>13}")
+    for name, page in pages:
+        expected = fetch_article_urls_legacy(page)
+        for size in (len(page) or 1, 4096, 7):
+            if extract_article_urls(chunked(page, size)) != expected:
+                print(f"MISMATCH on {name} with {size}-character chunks")
+                failed = True
+        kb = len(page) / 1024
+        runs = 3
+        legacy = min(timeit.repeat(lambda: fetch_article_urls_legacy(page), number=1, repeat=runs))
+        parser = min(timeit.repeat(lambda: extract_article_urls([page]), number=1, repeat=runs))
+        print(
+            f"{name:<20} {kb:7.0f} {len(expected):6d} {legacy * 1e3:9.1f} {parser * 1e3:10.1f} "
+            f"{legacy * 1e6 / kb:12.1f} {parser * 1e6 / kb:13.1f}"
+        )
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
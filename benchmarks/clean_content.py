@@ -0,0 +1,106 @@
+"""Compare generate_feed.clean_content with the original chain of re.sub passes.
+
+Checks that both produce identical output on a corpus and times them on large
+bodies. By default the corpus is synthetic markup modelled on what WordPress
+renders for Wire posts (Gutenberg image, embed and HTML blocks, lazy-loading
+attributes, inline scripts). Pass JSON files saved from /wp-json/wp/v2/posts
+to check against real Wire posts; mismatching posts are listed by id:
+
+    python benchmarks/clean_content.py posts-page1.json posts-page2.json
+
+The single pass only differs from the chain on malformed markup where matches
+overlap, such as an unterminated attribute value (sizes="x data-y="z").
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from generate_feed import clean_content  # noqa: E402
+
+
+def clean_content_legacy(html_content):
+    html_content = re.sub(r"<script[^>]*>.*?</script>", "", html_content, flags=re.DOTALL)
+    html_content = re.sub(r"<noscript[^>]*>.*?</noscript>", "", html_content, flags=re.DOTALL)
+    html_content = re.sub(r"<style[^>]*>.*?</style>", "", html_content, flags=re.DOTALL)
+    html_content = re.sub(r'\s+data-\w+="[^"]*"', "", html_content)
+    html_content = re.sub(r'\s+(?:loading|decoding)="[^"]*"', "", html_content)
+    html_content = re.sub(r'\s+srcset="[^"]*"', "", html_content)
+    html_content = re.sub(r'\s+sizes="[^"]*"', "", html_content)
+    html_content = re.sub(r"\n{3,}", "\n\n", html_content)
+    return html_content.strip()
+
+
+BLOCKS = [
+    '<p data-block-id="{n}">Paragraph {n} with <a href="https://thewire.in/x">a link</a> and text.</p>',
+    '<figure class="wp-block-image size-large"><img loading="lazy" decoding="async" width="1200" height="800" '
+    'src="https://cms.thewire.in/img/{n}.jpg" alt="" class="wp-image-{n}" '
+    'srcset="https://cms.thewire.in/img/{n}-300.jpg 300w, https://cms.thewire.in/img/{n}-1024.jpg 1024w" '
+    'sizes="(max-width: 1200px) 100vw, 1200px" data-attachment-id="{n}" data-orig-size="1200,800" />'
+    '<figcaption class="wp-element-caption">Photo {n}: <em>Credit</em></figcaption></figure>',
+    '<img data-lazy-src="https://cms.thewire.in/img/{n}.jpg" data-lazy-srcset="https://cms.thewire.in/img/{n}-300.jpg 300w" '
+    'src="data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7" />'
+    '<noscript><img src="https://cms.thewire.in/img/{n}.jpg" /></noscript>',
+    '<figure class="wp-block-embed is-type-rich is-provider-twitter wp-block-embed-twitter">'
+    '<div class="wp-block-embed__wrapper">\n<blockquote class="twitter-tweet" data-width="500" data-dnt="true">'
+    '<p lang="en" dir="ltr">Tweet {n}</p>&mdash; Someone (@someone) '
+    '<a href="https://twitter.com/someone/status/{n}">June 1, 2024</a></blockquote>'
+    '<script async src="https://platform.twitter.com/widgets.js" charset="utf-8"></script>\n</div></figure>',
+    '<figure class="wp-block-embed is-type-video is-provider-youtube"><div class="wp-block-embed__wrapper">\n'
+    '<iframe loading="lazy" title="Video {n}" width="500" height="281" src="https://www.youtube.com/embed/{n}" '
+    'frameborder="0" allowfullscreen></iframe>\n</div></figure>',
+    '<script type="text/javascript">window.ads = window.ads || [];\nads.push({n});</script>',
+    '<style>.wp-block-{n} {{ margin: 0; }}</style>\n<div class="wp-block-{n}">Custom HTML block {n}</div>',
+    '<ul class="wp-block-list">\n<li>Point {n}</li>\n\n<li>Another point</li>\n</ul>',
+    '<h2 class="wp-block-heading" id="h-{n}">Heading {n}</h2>',
+]
+SEPARATORS = ["", "\n", "\n\n", "\n\n\n", "\n\n\n\n\n", " ", "\n \n\n"]
+
+
+def synthetic_body(rng, blocks):
+    parts = []
+    for n in range(blocks):
+        parts.append(rng.choice(SEPARATORS))
+        parts.append(rng.choice(BLOCKS).format(n=n))
+    parts.append(rng.choice(SEPARATORS))
+    return "".join(parts)
+
+
+def load_corpus(paths):
+    posts = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            posts.extend((post["id"], post["content"]["rendered"]) for post in json.load(f))
+    return posts
+
+
+def main():
+    rng = random.Random(42)
+    corpus = load_corpus(sys.argv[1:]) or [
+        (i, synthetic_body(rng, rng.randint(5, 200))) for i in range(500)
+    ]
+    mismatches = [i for i, body in corpus if clean_content(body) != clean_content_legacy(body)]
+    print(f"Corpus: {len(corpus)} bodies, {len(mismatches)} mismatches")
+    if mismatches:
+        print("  Mismatching posts:", ", ".join(map(str, mismatches[:20])))
+
+    for blocks in (100, 1_000, 10_000):
+        body = synthetic_body(rng, blocks)
+        runs = max(1, 2_000 // blocks)
+        legacy = min(timeit.repeat(lambda: clean_content_legacy(body), number=runs, repeat=5)) / runs
+        current = min(timeit.repeat(lambda: clean_content(body), number=runs, repeat=5)) / runs
+        print(
+            f"{len(body) / 1024:9.0f} KiB  legacy {legacy * 1000:8.2f} ms  "
+            f"single pass {current * 1000:8.2f} ms  ({legacy / current:.2f}x)"
+        )
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
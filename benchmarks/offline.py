@@ -0,0 +1,490 @@
+"""Offline end-to-end benchmark for all four generators.
+
+Serves recorded or synthetic responses for The Wire's WordPress API, the
+Scroll page, and the Caravan and EPW homepages and article pages from a local
+HTTP server. Each generator is pointed at that server and run end to end.
+Reports wall time, per-stage timings (fetch, render, write), peak traced
+memory and bytes written for each generator, and saves the results as JSON
+so runs can be compared across versions. Stage timings add up time across
+threads, so they can exceed wall time for concurrent stages.
+
+    python benchmarks/offline.py --posts 1000 --body-kb 40 --categories 50
+    python benchmarks/offline.py --fixtures recorded/ --warm
+
+A fixtures directory can hold any of: wire_posts.json (posts with _embedded
+data), wire_categories.json, scroll.html, caravan.html, epw.html, and
+article pages under caravan/ and epw/ mirroring their URL paths (e.g.
+caravan/politics/some-story.html). Anything missing is synthesized.
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+# --- Fixtures -----------------------------------------------------------------
+
+
+def synthetic_body(rng, size_kb):
+    paragraphs = []
+    size = 0
+    n = 0
+    while size < size_kb * 1024:
+        if n % 6 == 5:
+            block = (
+                f'<figure class="wp-block-image"><img loading="lazy" decoding="async" '
+                f'src="https://cms.thewire.in/img/{n}.jpg" srcset="https://cms.thewire.in/img/{n}-300.jpg 300w" '
+                f'sizes="(max-width: 1200px) 100vw" data-attachment-id="{n}"/></figure>'
+            )
+        else:
+            words = " ".join(rng.choice(("India", "court", "policy", "said", "the", "state")) for _ in range(80))
+            block = f'<p data-block="{n}">{words}.</p>'
+        paragraphs.append(block)
+        size += len(block) + 2
+        n += 1
+    paragraphs.append('<script>window.ads = [];</script>\n\n\n<noscript><img src="p.gif"/></noscript>')
+    return "\n\n".join(paragraphs)
+
+
+def synthetic_wire(rng, post_count, body_kb, category_count):
+    categories = [
+        {"id": 100 + i, "slug": f"category-{i}", "name": f"Category {i}", "count": 0, "taxonomy": "category"}
+        for i in range(category_count)
+    ]
+    now = datetime.datetime(2026, 1, 1, 12, 0, 0)
+    posts = []
+    for i in range(post_count):
+        date = now - datetime.timedelta(minutes=23 * i)
+        cats = rng.sample(categories, min(len(categories), rng.randint(1, 3)))
+        for cat in cats:
+            cat["count"] += 1
+        media = []
+        if i % 5:
+            media = [{
+                "id": 50000 + i,
+                "source_url": f"https://cms.thewire.in/wp-content/uploads/{i}.jpg",
+                "mime_type": "image/jpeg",
+                "alt_text": f"Image {i}",
+                "caption": {"rendered": f"<p>Caption {i}</p>"},
+                "media_details": {"sizes": {s: {"source_url": f"https://x/{i}-{s}.jpg"} for s in ("thumb", "medium", "large")}},
+            }]
+        posts.append({
+            "id": 10000 + i,
+            "date": date.isoformat(),
+            "modified": (date + datetime.timedelta(minutes=3)).isoformat(),
+            "link": f"https://thewire.in/politics/story-{i}",
+            "guid": {"rendered": f"https://cms.thewire.in/?p={10000 + i}"},
+            "title": {"rendered": f"Story {i} &#8216;quoted&#8217;"},
+            "excerpt": {"rendered": f"<p>Excerpt for story {i}&hellip;</p>"},
+            "content": {"rendered": synthetic_body(rng, body_kb)},
+            "author": 1 + i % 20,
+            "featured_media": media[0]["id"] if media else 0,
+            "categories": [c["id"] for c in cats],
+            "_embedded": {
+                "author": [{"id": 1 + i % 20, "name": f"Author {i % 20}", "description": "Bio " * 50}],
+                "wp:featuredmedia": media,
+                "wp:term": [[dict(c) for c in cats], [{"id": 1, "taxonomy": "post_tag", "name": "tag"}]],
+            },
+        })
+    return posts, categories
+
+
+def synthetic_scroll(count):
+    posts = [
+        {
+            "id": i,
+            "title": f"Newsletter {i}",
+            "permalink": f"https://scroll-newsletter.stck.me/post/{i}",
+            "summary": "Today's briefing " * 10,
+            "published": "2026-01-01T06:00:00+00:00",
+            "author": {"name": "Scroll"},
+            "meta": {"cover": {"src": {"image": f"https://img.stck.me/{i}.jpg"}}},
+        }
+        for i in range(count)
+    ]
+    state = {"siteContent": {"mixedPosts": {"content": posts}}}
+    return f"<html><body><script>window.__INITIAL_PINIA_STATE__ = {json.dumps(state)};</script></body></html>"
+
+
+def synthetic_caravan(count, padding_kb):
+    links = "".join(
+        f'<div class="card"><a class="link" href="/politics/story-{i}"><div><h3 class="title">Story {i}</h3></div></a></div>'
+        for i in range(count)
+    )
+    homepage = f'<html><body><a href="/pages/about"><h2>About</h2></a>{links}</body></html>'
+    pages = {}
+    for i in range(count):
+        ld = {
+            "@type": "Article",
+            "headline": f"Story {i}",
+            "description": "A long-form report " * 5,
+            "author": [{"name": f"Reporter {i % 7}"}],
+            "datePublished": f"2026-01-{1 + i % 28:02d}T10:00:00Z",
+            "image": f"//caravanmagazine.in/img/{i}.jpg",
+        }
+        pages[f"/politics/story-{i}"] = (
+            f'<html><head><meta property="og:image" content="https://caravanmagazine.in/img/{i}.jpg">'
+            f'</head><body><script type="application/ld+json">{json.dumps(ld)}</script>'
+            + "<p>body text</p>" * (padding_kb * 64)
+            + "</body></html>"
+        )
+    return homepage, pages
+
+
+def synthetic_epw(count, padding_kb):
+    links = "".join(
+        f'<a href="/journal/2026/1/editorials/editorial-{i}.html">Editorial number {i}</a>' for i in range(count)
+    )
+    homepage = f"<html><body>{links}</body></html>"
+    pages = {}
+    for i in range(count):
+        pages[f"/journal/2026/1/editorials/editorial-{i}.html"] = (
+            f'<html><head><meta property="og:title" content="Editorial {i}">'
+            f'<meta content="Summary of editorial {i}" name="description">'
+            f'<meta property="article:published_time" content="2026-01-{1 + i % 28:02d}T10:00:00+05:30">'
+            f'<meta property="og:image" content="//www.epw.in/img/{i}.jpg">'
+            f'<meta name="citation_author" content="Author {i % 5}"></head><body>'
+            + "<p>body text</p>" * (padding_kb * 64)
+            + "</body></html>"
+        )
+    return homepage, pages
+
+
+def load_fixtures(args):
+    rng = random.Random(args.seed)
+    fx = {}
+    posts, categories = synthetic_wire(rng, args.posts, args.body_kb, args.categories)
+    caravan_home, caravan_pages = synthetic_caravan(args.articles, args.page_kb)
+    epw_home, epw_pages = synthetic_epw(args.articles, args.page_kb)
+    fx["wire_posts"], fx["wire_categories"] = posts, categories
+    fx["scroll"] = synthetic_scroll(args.articles)
+    fx["caravan"], fx["caravan_pages"] = caravan_home, caravan_pages
+    fx["epw"], fx["epw_pages"] = epw_home, epw_pages
+
+    d = args.fixtures
+    if not d:
+        return fx
+
+    def read(name):
+        path = os.path.join(d, name)
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                return f.read()
+        return None
+
+    for key, name in (("wire_posts", "wire_posts.json"), ("wire_categories", "wire_categories.json")):
+        text = read(name)
+        if text:
+            fx[key] = json.loads(text)
+    for key in ("scroll", "caravan", "epw"):
+        fx[key] = read(f"{key}.html") or fx[key]
+    for site in ("caravan", "epw"):
+        site_dir = os.path.join(d, site)
+        if not os.path.isdir(site_dir):
+            continue
+        pages = {}
+        for dirpath, _, files in os.walk(site_dir):
+            for name in files:
+                full = os.path.join(dirpath, name)
+                path = "/" + os.path.relpath(full, site_dir).replace(os.sep, "/")
+                if site == "caravan":
+                    path = path[: -len(".html")]
+                with open(full, encoding="utf-8") as f:
+                    pages[path] = f.read()
+        fx[f"{site}_pages"] = pages
+    return fx
+
+
+# --- Local HTTP stand-in --------------------------------------------------------
+
+
+class Handler(BaseHTTPRequestHandler):
+    fixtures = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        path = url.path
+        fx = self.fixtures
+        if path.startswith("/wire/"):
+            return self.wire(path[len("/wire"):], query)
+        if path == "/scroll/":
+            return self.send(200, fx["scroll"], "text/html; charset=utf-8")
+        for site in ("caravan", "epw"):
+            if path == f"/{site}":
+                return self.send(200, fx[site], "text/html; charset=utf-8")
+            if path.startswith(f"/{site}/"):
+                page = fx[f"{site}_pages"].get(path[len(site) + 1:])
+                if page is not None:
+                    return self.send(200, page, "text/html; charset=utf-8")
+        self.send(404, "not found", "text/plain")
+
+    def wire(self, path, query):
+        fx = self.fixtures
+        ids = {int(i) for i in query["include"].split(",")} if query.get("include") else None
+        if path == "/wp/v2/categories":
+            cats = [c for c in fx["wire_categories"] if ids is None or c["id"] in ids]
+            return self.send_json(sorted(cats, key=lambda c: -c.get("count", 0)), query)
+        if path in ("/wp/v2/users", "/wp/v2/media"):
+            kind = "author" if path.endswith("users") else "wp:featuredmedia"
+            found = {}
+            for post in fx["wire_posts"]:
+                for obj in post.get("_embedded", {}).get(kind, []):
+                    found.setdefault(obj["id"], obj)
+            return self.send_json([found[i] for i in sorted(ids or ()) if i in found], query)
+        if path != "/wp/v2/posts":
+            return self.send(404, "not found", "text/plain")
+        posts = fx["wire_posts"]
+        if "categories" in query:
+            cat = int(query["categories"])
+            posts = [p for p in posts if cat in p.get("categories", [])]
+        if "modified_after" in query:
+            posts = [p for p in posts if p["modified"] > query["modified_after"]]
+        if "after" in query:
+            posts = [p for p in posts if p["date"] > query["after"]]
+        if ids is not None:
+            posts = [p for p in posts if p["id"] in ids]
+        per_page = int(query.get("per_page", 10))
+        page = int(query.get("page", 1))
+        pages = max(1, -(-len(posts) // per_page))
+        if page > pages:
+            return self.send(400, '{"code":"rest_post_invalid_page_number"}', "application/json")
+        batch = posts[(page - 1) * per_page: page * per_page]
+        headers = {"X-WP-Total": str(len(posts)), "X-WP-TotalPages": str(pages)}
+        self.send_json(batch, query, headers)
+
+    def send_json(self, objs, query, headers=None):
+        if "_fields" in query:
+            fields = set(query["_fields"].split(","))
+            objs = [{k: v for k, v in o.items() if k in fields} for o in objs]
+        elif "_embed" not in query:
+            objs = [{k: v for k, v in o.items() if k != "_embedded"} for o in objs]
+        self.send(200, json.dumps(objs), "application/json; charset=UTF-8", headers)
+
+    def send(self, status, body, content_type, headers=None):
+        data = body.encode("utf-8")
+        etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Streamed article fetches hang up once they have the page head
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def start_server(fixtures):
+    Handler.fixtures = fixtures
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# --- Measurement ----------------------------------------------------------------
+
+
+class StageTimer:
+    """Accumulates time spent in wrapped functions, by stage."""
+
+    def __init__(self):
+        self.totals = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def wrap(self, module, name, stage):
+        func = getattr(module, name)
+
+        def timed(*args, **kwargs):
+            # Only time the outermost call of a stage, so recursion within a
+            # stage isn't double counted
+            active = self.local.__dict__.setdefault("active", set())
+            if stage in active:
+                return func(*args, **kwargs)
+            active.add(stage)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                active.discard(stage)
+                with self.lock:
+                    self.totals[stage] = self.totals.get(stage, 0.0) + time.perf_counter() - start
+
+        setattr(module, name, timed)
+        return func
+
+
+def snapshot(path):
+    files = {}
+    for dirpath, _, names in os.walk(path):
+        for name in names:
+            st = os.stat(os.path.join(dirpath, name))
+            files[os.path.join(dirpath, name)] = (st.st_mtime_ns, st.st_size)
+    return files
+
+
+def bytes_written(before, after):
+    """Total size of the files that are new or were rewritten."""
+    return sum(size for path, (mtime, size) in after.items() if before.get(path, (None,))[0] != mtime)
+
+
+def run_generator(name, module, out_dir, timer, trace_memory):
+    module.OUT_DIR = out_dir
+    os.makedirs(out_dir, exist_ok=True)
+    timer.totals = {}
+    before = snapshot(out_dir)
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    module.main()
+    wall = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    stages = dict(timer.totals)
+    # write_feed consumes the item generator, so rendering happens inside it
+    if "write" in stages:
+        stages["write"] = max(0.0, stages["write"] - stages.get("render", 0.0))
+    return {
+        "generator": name,
+        "wall_seconds": round(wall, 4),
+        "stages": {k: round(v, 4) for k, v in sorted(stages.items())},
+        "peak_memory_bytes": peak,
+        "bytes_written": bytes_written(before, snapshot(out_dir)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--posts", type=int, default=300, help="synthetic Wire posts")
+    parser.add_argument("--body-kb", type=int, default=20, help="synthetic Wire post body size")
+    parser.add_argument("--categories", type=int, default=50, help="synthetic Wire categories")
+    parser.add_argument("--articles", type=int, default=30, help="synthetic Scroll/Caravan/EPW items")
+    parser.add_argument("--page-kb", type=int, default=60, help="synthetic Caravan/EPW article page size")
+    parser.add_argument("--fixtures", help="directory of recorded responses")
+    parser.add_argument("--warm", action="store_true", help="also time a second run with warm caches")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="feeds-bench-")
+    # Must be set before the generators are imported
+    os.environ["CACHE_DIR"] = os.path.join(work_dir, "cache")
+    os.environ.setdefault("HTTP_RATE", "0")
+    # The synthetic image URLs don't resolve
+    os.environ.setdefault("IMAGE_PROBE", "0")
+    sys.path.insert(0, ROOT)
+    import generate_caravan_feed
+    import generate_epw_feed
+    import generate_feed
+    import generate_scroll_feed
+    import rss_writer
+
+    fixtures = load_fixtures(args)
+    server, base = start_server(fixtures)
+    generate_feed.WP_API = f"{base}/wire/wp/v2/posts"
+    generate_feed.WP_CATEGORIES_API = f"{base}/wire/wp/v2/categories"
+    generate_feed.USERS.url = f"{base}/wire/wp/v2/users"
+    generate_feed.MEDIA.url = f"{base}/wire/wp/v2/media"
+    generate_feed.CATEGORIES.url = generate_feed.WP_CATEGORIES_API
+    generate_scroll_feed.SCROLL_URL = f"{base}/scroll/"
+    generate_caravan_feed.CARAVAN_URL = f"{base}/caravan"
+    generate_epw_feed.EPW_URL = f"{base}/epw"
+
+    timer = StageTimer()
+    timer.wrap(rss_writer, "write_feed", "write")
+    for module in (generate_feed, generate_scroll_feed, generate_caravan_feed, generate_epw_feed):
+        timer.wrap(module, "render_item", "render")
+    for module, name in (
+        (generate_feed, "fetch_posts_page"),
+        (generate_feed, "fetch_categories"),
+        (generate_scroll_feed, "fetch_posts"),
+        (generate_caravan_feed, "fetch_article_urls"),
+        (generate_caravan_feed, "fetch_article_meta"),
+        (generate_epw_feed, "fetch_article_urls"),
+        (generate_epw_feed, "fetch_article_meta"),
+    ):
+        timer.wrap(module, name, "fetch")
+
+    generators = [
+        ("wire", generate_feed),
+        ("scroll", generate_scroll_feed),
+        ("caravan", generate_caravan_feed),
+        ("epw", generate_epw_feed),
+    ]
+    passes = ["cold"] + (["warm"] if args.warm else [])
+    results = []
+    try:
+        for label in passes:
+            for name, module in generators:
+                result = run_generator(name, module, os.path.join(work_dir, "out"), timer, False)
+                result["pass"] = label
+                results.append(result)
+        if not args.no_memory:
+            # Peak memory comes from a separate cold pass, since tracing slows
+            # everything down
+            for (name, module), result in zip(generators, results):
+                shutil.rmtree(os.environ["CACHE_DIR"], ignore_errors=True)
+                shutil.rmtree(os.path.join(work_dir, "mem"), ignore_errors=True)
+                mem = run_generator(name, module, os.path.join(work_dir, "mem"), timer, True)
+                result["peak_memory_bytes"] = mem["peak_memory_bytes"]
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'generator':<10} {'pass':<5} {'wall':>8} {'fetch':>8} {'render':>8} {'write':>8} {'peak MiB':>9} {'written':>10}")
+    for r in results:
+        st = r["stages"]
+        peak = f"{r['peak_memory_bytes'] / 2**20:9.1f}" if r["peak_memory_bytes"] else f"{'-':>9}"
+        print(
+            f"{r['generator']:<10} {r['pass']:<5} {r['wall_seconds']:8.3f} {st.get('fetch', 0):8.3f} "
+            f"{st.get('render', 0):8.3f} {st.get('write', 0):8.3f} {peak} {r['bytes_written']:10d}"
+        )
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
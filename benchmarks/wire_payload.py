@@ -0,0 +1,112 @@
+"""Compare The Wire's post payload between the full _embed fetch and the lean one.
+
+For the main feed query and the largest categories, requests the same page
+of posts both ways and reports the response size of each. The lean fetch
+also needs author, media and category lookups. These are counted once, as
+they would be on a run with a cold lookup cache; warm runs skip most of
+them. Runs against the live API by default, or against the synthetic
+stand-in from offline.py with --offline:
+
+    python benchmarks/wire_payload.py --categories 10
+    python benchmarks/wire_payload.py --offline
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+import requests
+
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="wire-payload-"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import generate_feed  # noqa: E402
+
+
+def get(session, url, params):
+    resp = session.get(url, params=params, timeout=60)
+    resp.raise_for_status()
+    return resp
+
+
+def lookup_bytes(session, lookup, url, ids, seen):
+    """Bytes needed to resolve the ids not looked up yet, in batches of 100."""
+    ids = sorted(set(ids) - seen - {0, None})
+    seen.update(ids)
+    total = 0
+    for start in range(0, len(ids), lookup.BATCH):
+        batch = ids[start : start + lookup.BATCH]
+        params = {"include": ",".join(map(str, batch)), "per_page": len(batch), "_fields": lookup.fields}
+        total += len(get(session, url, params).content)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--categories", type=int, default=10, help="number of category queries")
+    parser.add_argument("--per-page", type=int, default=30)
+    parser.add_argument("--offline", action="store_true", help="use offline.py's synthetic stand-in")
+    args = parser.parse_args()
+
+    posts_api = generate_feed.WP_API
+    categories_api = generate_feed.WP_CATEGORIES_API
+    users_api = generate_feed.WP_USERS_API
+    media_api = generate_feed.WP_MEDIA_API
+    server = None
+    if args.offline:
+        import offline
+
+        fixtures = offline.load_fixtures(
+            SimpleNamespace(seed=1, posts=300, body_kb=20, categories=50, articles=0, page_kb=0, fixtures=None)
+        )
+        server, base = offline.start_server(fixtures)
+        posts_api, categories_api, users_api, media_api = (
+            f"{base}/wire/wp/v2/{name}" for name in ("posts", "categories", "users", "media")
+        )
+
+    session = requests.Session()
+    session.headers.update({"User-Agent": "TheWireRSS/1.0"})
+    try:
+        categories = get(
+            session, categories_api, {"per_page": 100, "orderby": "count", "order": "desc"}
+        ).json()
+        queries = [("feed", None)] + [(c["slug"], c["id"]) for c in categories[: args.categories]]
+        seen = {"users": set(), "media": set(), "categories": set()}
+
+        print(f"{'query':<28} {'embed KB':>9} {'lean KB':>9} {'lookups KB':>11} {'saved':>7}")
+        totals = [0, 0, 0]
+        for name, category_id in queries:
+            params = {"per_page": args.per_page, "orderby": "date", "order": "desc"}
+            if category_id:
+                params["categories"] = category_id
+            full = len(get(session, posts_api, dict(params, _embed="author,wp:term,wp:featuredmedia")).content)
+            lean_resp = get(session, posts_api, dict(params, _fields=generate_feed.POST_FIELDS))
+            lean = len(lean_resp.content)
+            posts = lean_resp.json()
+            extra = (
+                lookup_bytes(session, generate_feed.USERS, users_api, (p["author"] for p in posts), seen["users"])
+                + lookup_bytes(session, generate_feed.MEDIA, media_api, (p["featured_media"] for p in posts), seen["media"])
+                + lookup_bytes(
+                    session,
+                    generate_feed.CATEGORIES,
+                    categories_api,
+                    (c for p in posts for c in p["categories"]),
+                    seen["categories"],
+                )
+            )
+            saved = 1 - (lean + extra) / full if full else 0.0
+            print(f"{name[:28]:<28} {full / 1024:9.1f} {lean / 1024:9.1f} {extra / 1024:11.1f} {saved:7.1%}")
+            for i, value in enumerate((full, lean, extra)):
+                totals[i] += value
+
+        full, lean, extra = totals
+        print(f"{'total':<28} {full / 1024:9.1f} {lean / 1024:9.1f} {extra / 1024:11.1f} {1 - (lean + extra) / full:7.1%}")
+    finally:
+        if server:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""Overall time budget for a run.
+
+The workflow is cancelled when the next scheduled run starts, and a
+cancelled run deploys nothing. With RUN_BUDGET set, work stops being
+started once the budget is nearly used up. RESERVE seconds are kept for
+writing the index, compressing and reporting, so everything that finished
+still gets deployed. Lower-priority work stops first: Wire categories (least
+popular last) stop CATEGORY_MARGIN seconds before the other sources' article
+pages.
+
+generate_all also cancels a source that overruns its own timeout, which
+makes ``expired`` true for that source alone, so it stops the same way.
+"""
+
+import math
+import os
+import time
+
+BUDGET = float(os.environ.get("RUN_BUDGET", "0"))
+RESERVE = float(os.environ.get("RUN_BUDGET_RESERVE", "60"))
+CATEGORY_MARGIN = float(os.environ.get("RUN_BUDGET_CATEGORY_MARGIN", "120"))
+
+_start = time.monotonic()
+_cancelled = set()
+
+
+class BudgetExceeded(Exception):
+    """Work skipped because the run is out of time."""
+
+    def __str__(self):
+        return "out of time budget"
+
+
+def remaining():
+    """Seconds left for starting new work (infinite without a budget)."""
+    if BUDGET <= 0:
+        return math.inf
+    return _start + BUDGET - RESERVE - time.monotonic()
+
+
+def cancel(source):
+    """Ask ``source`` to stop starting new work and wrap up."""
+    _cancelled.add(source)
+
+
+def expired(margin=0.0, source=None):
+    """Whether work that should stop ``margin`` seconds early must not start,
+    because the budget is nearly used up or ``source`` has been cancelled."""
+    return source in _cancelled or remaining() <= margin
@@ -0,0 +1,85 @@
+"""Pre-compressed copies of the generated files for static hosting.
+
+Each feed and index.html gets a ``.gz`` sibling, plus a ``.br`` one when the
+brotli package is installed, so a static server or CDN can send compressed
+bodies without compressing on the fly. A compressed copy carries its source's
+mtime, and it is only rebuilt when that no longer matches. Feeds that
+rss_writer left untouched are therefore not compressed again.
+"""
+
+import gzip
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import state
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ENABLED = os.environ.get("PRECOMPRESS", "1") != "0"
+WORKERS = 4
+
+
+def _gzip(data):
+    # mtime=0 keeps the output identical for identical input
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+def encoders():
+    """Return (extension, compress function) pairs for the available encodings."""
+    found = [(".gz", _gzip)]
+    if brotli is not None:
+        found.append((".br", _brotli))
+    return found
+
+
+def _wanted(name):
+    return name.endswith(".xml") or name == "index.html"
+
+
+def compress_file(path, encoders):
+    """Write the compressed siblings of ``path`` that are missing or out of
+    date. Returns the number of files written."""
+    mtime = os.stat(path).st_mtime_ns
+    stale = []
+    for ext, encode in encoders:
+        try:
+            if os.stat(path + ext).st_mtime_ns == mtime:
+                continue
+        except OSError:
+            pass
+        stale.append((ext, encode))
+    if not stale:
+        return 0
+    with open(path, "rb") as f:
+        data = f.read()
+    for ext, encode in stale:
+        state.atomic_write(path + ext, encode(data))
+        os.utime(path + ext, ns=(mtime, mtime))
+    return len(stale)
+
+
+def compress_dir(out_dir, workers=WORKERS):
+    """Compress every feed and index.html in ``out_dir`` in parallel and
+    remove compressed copies whose source is gone. Returns the number of
+    compressed files written."""
+    if not ENABLED:
+        return 0
+    available = encoders()
+    names = set(os.listdir(out_dir))
+    for name in names:
+        for ext, _ in available:
+            if name.endswith(ext) and _wanted(name[: -len(ext)]) and name[: -len(ext)] not in names:
+                os.unlink(os.path.join(out_dir, name))
+    paths = [os.path.join(out_dir, name) for name in sorted(names) if _wanted(name)]
+    # zlib and brotli release the GIL, so threads compress in parallel
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        written = sum(pool.map(lambda path: compress_file(path, available), paths))
+    print(f"Compressed {written} files ({', '.join(ext for ext, _ in available)})")
+    return written
@@ -0,0 +1,196 @@
+"""Run every feed generator concurrently in one process.
+
+Each source runs in its own thread with its own time limit, and a failure or
+timeout in one source doesn't affect the others. A source that times out is
+cancelled and given STOP_GRACE seconds to write what it has. The index page
+is written last and links the feeds that were generated, including those of
+sources that were stopped early.
+
+Sources that the adaptive schedule (scheduler.py) says are not due yet are
+skipped, and their existing feeds are kept and still linked.
+
+With a run budget (budget.py), sources stop starting new work when it runs
+out and get half of its reserve to write what they have, so the index and
+every finished feed are written in time. Within the budget, work is ranked:
+the main Wire feed is written first, the other sources fetch their article
+pages until the budget runs out, and Wire categories, most popular first,
+stop a little earlier than that.
+"""
+
+import os
+import threading
+import time
+
+import budget
+import compress
+import generate_caravan_feed
+import generate_epw_feed
+import generate_feed
+import generate_scroll_feed
+import metrics
+import rss_writer
+import scheduler
+
+# (name, feed file, generator, default timeout in seconds)
+SOURCES = [
+    ("wire", "feed.xml", lambda: generate_feed.main(index=False), 900),
+    ("scroll", "scroll.xml", generate_scroll_feed.main, 120),
+    ("caravan", "caravan.xml", generate_caravan_feed.main, 300),
+    ("epw", "epw.xml", generate_epw_feed.main, 600),
+]
+
+
+# Seconds a timed-out source gets to stop cleanly: long enough for the
+# requests it has in flight to finish or time out
+STOP_GRACE = float(os.environ.get("SOURCE_STOP_GRACE", "45"))
+
+
+def source_timeout(name, default):
+    """A source's own time limit, cut short to what's left of the run budget."""
+    timeout = float(os.environ.get(f"{name.upper()}_TIMEOUT", default))
+    return max(0.0, min(timeout, budget.remaining()))
+
+
+def stop_deadline():
+    """When to give up on sources that were asked to stop. Out of the run
+    budget's reserve they get half, so the index, compression and report
+    still fit in the other half."""
+    return time.monotonic() + min(STOP_GRACE, budget.remaining() + budget.RESERVE / 2)
+
+
+class SourceRun:
+    def __init__(self, name, feed, generate, timeout):
+        self.name = name
+        self.feed = feed
+        self.generate = generate
+        self.timeout = timeout
+        self.status = None
+        self.outcome = None
+        self.result = None
+        self.duration = None
+        self.elapsed = None
+        # Daemon thread, so a source that overruns its timeout can't keep the
+        # process alive after everything else is done
+        self.thread = threading.Thread(target=self.run, name=name, daemon=True)
+
+    def run(self):
+        start = time.monotonic()
+        try:
+            self.result = self.generate()
+            # Scroll, Caravan and EPW return False when they skip their feed
+            self.outcome = "failed" if self.result is False else "ok"
+        except Exception as e:
+            print(f"  {self.name} failed: {e}")
+            self.outcome = "failed"
+        self.duration = time.monotonic() - start
+
+
+def run_sources(sources):
+    runs = [SourceRun(name, feed, gen, source_timeout(name, t)) for name, feed, gen, t in sources]
+    start = time.monotonic()
+    for run in runs:
+        run.thread.start()
+    # Wait on the earliest deadline first so each timeout is enforced on time
+    for run in sorted(runs, key=lambda r: r.timeout):
+        run.thread.join(max(0.0, start + run.timeout - time.monotonic()))
+        if run.thread.is_alive():
+            if budget.expired():
+                # Already stopping: every source checks the budget between items
+                print(f"  {run.name} stopped by the run budget after {run.timeout:.0f}s")
+                run.status = "budget"
+            else:
+                print(f"  {run.name} timed out after {run.timeout:.0f}s, stopping it")
+                run.status = "timeout"
+                budget.cancel(run.name)
+            run.elapsed = time.monotonic() - start
+        else:
+            run.status = run.outcome
+            run.elapsed = run.duration
+    # A cancelled source stops starting new work. Wait for it to finish what
+    # it started and save its feed and state, rather than killing it mid-write
+    deadline = stop_deadline()
+    for run in runs:
+        if run.status not in ("timeout", "budget"):
+            continue
+        run.thread.join(max(0.0, deadline - time.monotonic()))
+        if run.thread.is_alive():
+            print(f"  {run.name} did not stop in time; its feed is left as it was")
+        run.elapsed = time.monotonic() - start
+    return runs
+
+
+def print_summary(runs, total):
+    print("\nSource     Status    Time")
+    for run in runs:
+        print(f"{run.name:<10} {run.status:<8} {run.elapsed:6.1f}s")
+    print(f"{'total':<10} {'':<8} {total:6.1f}s")
+
+
+def split_due(sources, schedule):
+    """Split ``sources`` into those to run now and those whose existing feed
+    can be kept until the schedule says they are due."""
+    due, skipped = [], []
+    for source in sources:
+        name, feed = source[:2]
+        if schedule.due(name) or not os.path.exists(os.path.join(generate_feed.OUT_DIR, feed)):
+            due.append(source)
+        else:
+            skipped.append(source)
+    return due, skipped
+
+
+def main():
+    start = time.monotonic()
+    schedule = scheduler.SCHEDULE
+    due, skipped = split_due(SOURCES, schedule)
+    runs = run_sources(due)
+    for name, feed, gen, t in skipped:
+        run = SourceRun(name, feed, gen, t)
+        run.status, run.elapsed, run.result = "skipped", 0.0, schedule.result(name)
+        runs.append(run)
+    order = [source[0] for source in SOURCES]
+    runs.sort(key=lambda run: order.index(run.name))
+
+    ok = [run for run in runs if run.status == "ok"]
+    for run in ok:
+        feed_path = os.path.join(generate_feed.OUT_DIR, run.feed)
+        schedule.record(run.name, rss_writer.feed_guids(feed_path), run.result)
+    schedule.save()
+
+    kept = [run for run in runs if run.status in ("ok", "skipped")]
+    # A source that was stopped early still has its feed from this or the
+    # last run on disk; keep linking it, with the category feeds it reported
+    # or, if it never returned, the ones last recorded
+    for run in runs:
+        if run.status in ("timeout", "budget") and os.path.exists(
+            os.path.join(generate_feed.OUT_DIR, run.feed)
+        ):
+            kept.append(run)
+    wire = next((run for run in kept if run.name == "wire"), None)
+    if wire is None:
+        category_feeds = []
+    else:
+        stopped = wire.status in ("timeout", "budget") and wire.outcome != "ok"
+        wire_result = schedule.result("wire") if stopped else wire.result
+        category_feeds = [
+            tuple(feed)
+            for feed in wire_result or []
+            if os.path.exists(os.path.join(generate_feed.OUT_DIR, f"{feed[0]}.xml"))
+        ]
+    base_url = os.environ.get("BASE_URL", "").rstrip("/")
+    os.makedirs(generate_feed.OUT_DIR, exist_ok=True)
+    # Left behind by a source that was still writing when it was given up on
+    rss_writer.remove_temp_files(generate_feed.OUT_DIR)
+    generate_feed.write_index(base_url, category_feeds, {run.feed for run in kept})
+    with metrics.stage("all", "compress"):
+        compress.compress_dir(generate_feed.OUT_DIR)
+
+    print_summary(runs, time.monotonic() - start)
+    metrics.write_report(
+        generate_feed.OUT_DIR,
+        {run.name: {"status": run.status, "seconds": round(run.elapsed, 2)} for run in runs},
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,15 +2,31 @@ import datetime
 import json
 import os
 import re
+from html.parser import HTMLParser
 
 import requests
 
+import article_cache
+import compress
+import head_fetch
+import http_cache
+import image_probe
+import item_store
+import metrics
+import rss_writer
+import throttle
+
 CARAVAN_URL = "https://caravanmagazine.in"
 SESSION = requests.Session()
 SESSION.headers.update({"User-Agent": "CaravanRSS/1.0"})
+http_cache.install(SESSION)
+metrics.instrument(SESSION, "caravan")
 OUT_DIR = os.path.join(os.path.dirname(__file__), "public")
 
 SKIP_PREFIXES = ("/pages/", "/magazine/", "/sponsored-feature/", "/archives")
+HEADINGS = {"h1", "h2", "h3", "h4", "h5", "h6"}
+ARTICLE_HREF_RE = re.compile(r"/[a-z].")
+LD_JSON_RE = re.compile(r'<script[^>]*type="application/ld\+json"[^>]*>(.*?)</script>', re.DOTALL)
 
 
 def escape_xml(text):
@@ -23,14 +39,47 @@ def escape_xml(text):
     )
 
 
-def fetch_article_urls():
-    resp = SESSION.get(CARAVAN_URL, timeout=30)
-    resp.raise_for_status()
-    pattern = r'<a[^>]*href="(/[a-z][^"]+)"[^>]*>.*?<h[1-6][^>]*>(.*?)</h[1-6]>'
-    matches = re.findall(pattern, resp.text, re.DOTALL)
+class HeadlineLinkParser(HTMLParser):
+    """Collect the site-relative links that lead to a heading, in one pass.
+
+    Each link is paired with the first complete heading that opens after it,
+    whether the heading is inside the anchor or follows it in the same card;
+    other links before that heading are ignored. The page can be fed in
+    chunks. This keeps the pairing of the regex it replaces, whose lazy scan
+    from every anchor made link-heavy pages close to quadratic.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.links = []
+        self._href = None
+        self._in_heading = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "a" and self._href is None:
+            href = dict(attrs).get("href")
+            if href and ARTICLE_HREF_RE.match(href):
+                self._href = href
+        elif tag in HEADINGS and self._href is not None:
+            self._in_heading = True
+
+    def handle_endtag(self, tag):
+        if tag in HEADINGS and self._in_heading:
+            self.links.append(self._href)
+            self._href = None
+            self._in_heading = False
+
+
+def extract_article_urls(chunks):
+    """Return the article paths linked from headings in the page ``chunks``,
+    in page order and without duplicates."""
+    parser = HeadlineLinkParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+    parser.close()
     seen = set()
     urls = []
-    for url, _ in matches:
+    for url in parser.links:
         if url in seen:
             continue
         if any(url.startswith(p) for p in SKIP_PREFIXES):
@@ -44,21 +93,46 @@ def fetch_article_urls():
     return urls
 
 
-def fetch_article_meta(path):
+def fetch_article_urls():
+    resp = SESSION.get(CARAVAN_URL, timeout=30)
+    resp.raise_for_status()
+    if resp.encoding is None:
+        resp.encoding = resp.apparent_encoding
+    return extract_article_urls(resp.iter_content(64 * 1024, decode_unicode=True))
+
+
+def fetch_article_meta(path, cache=None):
+    if cache is not None:
+        meta = cache.get(path)
+        if meta is not article_cache.MISSING:
+            return meta
+
+    print(f"  Fetching metadata: {path}")
     url = f"{CARAVAN_URL}{path}"
     try:
-        resp = SESSION.get(url, timeout=30)
-        resp.raise_for_status()
+        with throttle.LIMITER.slot(url, "caravan"):
+            page = head_fetch.fetch_text(SESSION, url, has_article_meta)
     except Exception as e:
         print(f"    Error fetching {path}: {e}")
         return None
 
+    with metrics.stage("caravan", "parse"):
+        meta = parse_article_meta(url, page)
+    if cache is not None:
+        cache.put(path, meta)
+    return meta
+
+
+def has_article_meta(page):
+    """Whether ``page`` (possibly a prefix) holds everything parse_article_meta
+    reads: the first JSON-LD block, closed, and the end of <head>, where the
+    og:image tag lives."""
+    return "</head>" in page and LD_JSON_RE.search(page) is not None
+
+
+def parse_article_meta(url, page):
     # Extract JSON-LD
-    ld_match = re.search(
-        r'<script[^>]*type="application/ld\+json"[^>]*>(.*?)</script>',
-        resp.text,
-        re.DOTALL,
-    )
+    ld_match = LD_JSON_RE.search(page)
     if not ld_match:
         return None
 
@@ -72,7 +146,7 @@ def fetch_article_meta(path):
 
     # Extract og:image as fallback (JSON-LD image sometimes missing protocol)
     og_match = re.search(
-        r'<meta[^>]*property="og:image"[^>]*content="([^"]+)"', resp.text
+        r'<meta[^>]*property="og:image"[^>]*content="([^"]+)"', page
     )
     image = data.get("image", "")
     if og_match:
@@ -105,39 +179,34 @@ def format_rfc822(iso_str):
         return ""
 
 
-def build_rss(articles, feed_url):
-    now = datetime.datetime.now(datetime.timezone.utc).strftime(
-        "%a, %d %b %Y %H:%M:%S +0000"
-    )
+def render_item(a):
+    title = escape_xml(a["title"])
+    link = escape_xml(a["url"])
+    desc = escape_xml(a["description"])
+    author = escape_xml(a["author"])
+    pub_date = format_rfc822(a["date"])
+    guid = link
+
+    thumbnail_xml = ""
+    if a.get("image"):
+        img = escape_xml(a["image"])
+        length, img_type = image_probe.PROBE.describe(a["image"], "image/jpeg")
+        file_size = f' fileSize="{length}"' if length else ""
+        thumbnail_xml = (
+            f'      <media:content url="{img}" medium="image" type="{img_type}"{file_size}/>\n'
+            f'      <media:thumbnail url="{img}"/>\n'
+            f'      <enclosure url="{img}" type="{img_type}" length="{length}"/>\n'
+        )
 
-    items = []
-    for a in articles:
-        title = escape_xml(a["title"])
-        link = escape_xml(a["url"])
-        desc = escape_xml(a["description"])
-        author = escape_xml(a["author"])
-        pub_date = format_rfc822(a["date"])
-        guid = link
-
-        thumbnail_xml = ""
-        if a.get("image"):
-            img = escape_xml(a["image"])
-            thumbnail_xml = (
-                f'      <media:content url="{img}" medium="image" type="image/jpeg"/>\n'
-                f'      <media:thumbnail url="{img}"/>\n'
-                f'      <enclosure url="{img}" type="image/jpeg" length="0"/>\n'
-            )
-
-        # Extract category from URL path
-        category_xml = ""
-        path = a["url"].replace(CARAVAN_URL, "").strip("/")
-        parts = path.split("/")
-        if parts:
-            cat = parts[0].replace("-", " ").title()
-            category_xml = f"      <category>{escape_xml(cat)}</category>\n"
-
-        items.append(
-            f"""    <item>
+    # Extract category from URL path
+    category_xml = ""
+    path = a["url"].replace(CARAVAN_URL, "").strip("/")
+    parts = path.split("/")
+    if parts:
+        cat = parts[0].replace("-", " ").title()
+        category_xml = f"      <category>{escape_xml(cat)}</category>\n"
+
+    return f"""    <item>
       <title>{title}</title>
       <link>{link}</link>
       <guid isPermaLink="true">{guid}</guid>
@@ -145,57 +214,73 @@ def build_rss(articles, feed_url):
       <dc:creator>{author}</dc:creator>
       <description>{desc}</description>
 {thumbnail_xml}{category_xml}    </item>"""
-        )
 
-    items_xml = "\n".join(items)
-
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
-<rss version="2.0"
-  xmlns:content="http://purl.org/rss/1.0/modules/content/"
-  xmlns:dc="http://purl.org/dc/elements/1.1/"
-  xmlns:atom="http://www.w3.org/2005/Atom"
-  xmlns:media="http://search.yahoo.com/mrss/">
-  <channel>
-    <title>The Caravan</title>
-    <link>{escape_xml(CARAVAN_URL)}</link>
-    <description>The Caravan - A journal of politics and culture from India</description>
-    <language>en</language>
-    <lastBuildDate>{now}</lastBuildDate>
-    <atom:link href="{escape_xml(feed_url)}" rel="self" type="application/rss+xml"/>
-{items_xml}
-  </channel>
-</rss>"""
+
+def iter_rss(articles, feed_url):
+    """Yield the feed in chunks, rendering one item at a time."""
+    items = metrics.timed("caravan", "render", (render_item(a) for a in articles))
+    return rss_writer.iter_feed(
+        "The Caravan",
+        CARAVAN_URL,
+        "The Caravan - A journal of politics and culture from India",
+        feed_url,
+        items,
+    )
+
+
+def build_rss(articles, feed_url):
+    return "".join(iter_rss(articles, feed_url))
+
+
+def fetch_articles():
+    """Fetch the homepage and the metadata of every article it lists, in
+    homepage order. Raises if the homepage can't be fetched."""
+    with metrics.stage("caravan", "fetch"):
+        urls = fetch_article_urls()
+    print(f"  Found {len(urls)} article URLs")
+
+    cache = article_cache.ArticleCache("caravan_articles.json")
+    # Fetched concurrently, collected in homepage order
+    with metrics.stage("caravan", "articles"):
+        metas = throttle.map_ordered(lambda path: fetch_article_meta(path, cache), urls)
+    cache.save()
+    print(f"  Reused cached metadata for {cache.hits} of {len(urls)} articles")
+    return [meta for meta in metas if meta]
 
 
 def main():
     os.makedirs(OUT_DIR, exist_ok=True)
     base_url = os.environ.get("BASE_URL", "").rstrip("/")
 
+    store = item_store.ItemStore("caravan_store.json", lambda a: a["url"], lambda a: a.get("date", ""))
     print("Fetching Caravan homepage...")
     try:
-        urls = fetch_article_urls()
+        articles = store.merge(fetch_articles())
     except Exception as e:
         print(f"  Failed to fetch Caravan homepage: {e}")
-        print("  Skipping Caravan feed generation")
-        return
-    print(f"  Found {len(urls)} article URLs")
-
-    articles = []
-    for path in urls:
-        print(f"  Fetching metadata: {path}")
-        meta = fetch_article_meta(path)
-        if meta:
-            articles.append(meta)
-
-    # Sort by date descending
-    articles.sort(key=lambda a: a.get("date", ""), reverse=True)
-
+        articles = store.items()
+        if not articles:
+            print("  Skipping Caravan feed generation")
+            return False
+        print(f"  Serving the {len(articles)} articles from earlier runs")
+    store.save()
+
+    with metrics.stage("caravan", "images"):
+        image_probe.PROBE.probe((a.get("image") for a in articles), "caravan")
     feed_url = f"{base_url}/caravan.xml" if base_url else "caravan.xml"
-    rss = build_rss(articles, feed_url)
-    with open(os.path.join(OUT_DIR, "caravan.xml"), "w", encoding="utf-8") as f:
-        f.write(rss)
-    print(f"Wrote caravan.xml ({len(articles)} articles)")
+    with metrics.stage("caravan", "write"):
+        written = rss_writer.write_feed(os.path.join(OUT_DIR, "caravan.xml"), iter_rss(articles, feed_url))
+    if written:
+        print(f"Wrote caravan.xml ({len(articles)} articles)")
+    else:
+        print(f"caravan.xml unchanged ({len(articles)} articles)")
+    rss_writer.save_manifest()
+    image_probe.PROBE.save()
+    http_cache.prune()
+    return True
 
 
 if __name__ == "__main__":
     main()
+    compress.compress_dir(OUT_DIR)
+    metrics.write_report(OUT_DIR)
@@ -4,6 +4,16 @@ import re
 
 import requests
 
+import article_cache
+import compress
+import head_fetch
+import http_cache
+import image_probe
+import item_store
+import metrics
+import rss_writer
+import throttle
+
 EPW_URL = "https://www.epw.in"
 SESSION = requests.Session()
 SESSION.headers.update(
@@ -12,6 +22,8 @@ SESSION.headers.update(
         "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     }
 )
+http_cache.install(SESSION)
+metrics.instrument(SESSION, "epw")
 OUT_DIR = os.path.join(os.path.dirname(__file__), "public")
 
 
@@ -44,46 +56,86 @@ def fetch_article_urls():
     return urls
 
 
-def extract_meta(html, prop):
-    # Try property= first, then name=
-    patterns = [
-        rf'<meta[^>]*property="{prop}"[^>]*content="([^"]*)"',
-        rf'<meta[^>]*content="([^"]*)"[^>]*property="{prop}"',
-        rf'<meta[^>]*name="{prop}"[^>]*content="([^"]*)"',
-        rf'<meta[^>]*content="([^"]*)"[^>]*name="{prop}"',
-    ]
-    for p in patterns:
-        m = re.search(p, html)
-        if m:
-            return m.group(1)
-    return ""
+META_TAG_RE = re.compile(r"""<meta\b(?:[^>"']|"[^"]*"|'[^']*')*>""", re.IGNORECASE)
+META_ATTR_RE = re.compile(r"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+AUTHOR_RE = re.compile(r'class="[^"]*author[^"]*"[^>]*>([^<]+)')
+
+
+def meta_index(html):
+    """Map the property= and name= of every meta tag to its content, in one
+    pass over the page. The first tag wins for each key, and property= takes
+    precedence over name=, whatever the attribute order."""
+    properties = {}
+    names = {}
+    for tag in META_TAG_RE.finditer(html):
+        attrs = {}
+        for m in META_ATTR_RE.finditer(tag.group()):
+            value = m.group(2) if m.group(2) is not None else m.group(3)
+            attrs.setdefault(m.group(1).lower(), value)
+        content = attrs.get("content")
+        if content is None:
+            continue
+        if "property" in attrs:
+            properties.setdefault(attrs["property"], content)
+        if "name" in attrs:
+            names.setdefault(attrs["name"], content)
+    names.update(properties)
+    return names
+
 
+def fetch_article_meta(path, cache=None):
+    if cache is not None:
+        meta = cache.get(path)
+        if meta is not article_cache.MISSING:
+            return meta
 
-def fetch_article_meta(path):
+    print(f"  Fetching metadata: {path}")
     url = f"{EPW_URL}{path}"
     try:
-        resp = SESSION.get(url, timeout=30)
-        resp.raise_for_status()
+        with throttle.LIMITER.slot(url, "epw"):
+            page = head_fetch.fetch_text(SESSION, url, has_article_meta)
     except Exception as e:
         print(f"    Error fetching {path}: {e}")
         return None
 
-    page = resp.text
-    title = extract_meta(page, "og:title")
+    with metrics.stage("epw", "parse"):
+        meta = parse_article_meta(path, url, page)
+    if cache is not None:
+        cache.put(path, meta)
+    return meta
+
+
+def has_article_meta(page):
+    """Whether ``page`` (possibly a prefix) holds everything parse_article_meta
+    reads: all of <head>, and an author from citation_author or a complete
+    byline in the body."""
+    head_end = page.find("</head>")
+    if head_end < 0:
+        return False
+    if meta_index(page[:head_end]).get("citation_author"):
+        return True
+    # The byline must be followed by a tag, or it may continue in the next chunk
+    match = AUTHOR_RE.search(page)
+    return match is not None and match.end() < len(page)
+
+
+def parse_article_meta(path, url, page):
+    meta = meta_index(page)
+    title = meta.get("og:title", "")
     if not title:
         return None
 
-    description = extract_meta(page, "description")
-    pub_date = extract_meta(page, "article:published_time")
-    image = extract_meta(page, "og:image")
+    description = meta.get("description", "")
+    pub_date = meta.get("article:published_time", "")
+    image = meta.get("og:image", "")
     if image and image.startswith("//"):
         image = "https:" + image
 
     # Extract author from citation_author or page content
-    author = extract_meta(page, "citation_author")
+    author = meta.get("citation_author", "")
     if not author:
         # Try to find author in the page body
-        author_match = re.search(r'class="[^"]*author[^"]*"[^>]*>([^<]+)', page)
+        author_match = AUTHOR_RE.search(page)
         if author_match:
             author = author_match.group(1).strip()
     if not author:
@@ -116,35 +168,30 @@ def format_rfc822(iso_str):
         return ""
 
 
-def build_rss(articles, feed_url):
-    now = datetime.datetime.now(datetime.timezone.utc).strftime(
-        "%a, %d %b %Y %H:%M:%S +0000"
-    )
+def render_item(a):
+    title = escape_xml(a["title"])
+    link = escape_xml(a["url"])
+    desc = escape_xml(a["description"][:500]) if a["description"] else ""
+    author = escape_xml(a["author"])
+    pub_date = format_rfc822(a["date"])
+    guid = link
+
+    thumbnail_xml = ""
+    if a.get("image"):
+        img = escape_xml(a["image"])
+        length, img_type = image_probe.PROBE.describe(a["image"], "image/jpeg")
+        file_size = f' fileSize="{length}"' if length else ""
+        thumbnail_xml = (
+            f'      <media:content url="{img}" medium="image" type="{img_type}"{file_size}/>\n'
+            f'      <media:thumbnail url="{img}"/>\n'
+            f'      <enclosure url="{img}" type="{img_type}" length="{length}"/>\n'
+        )
 
-    items = []
-    for a in articles:
-        title = escape_xml(a["title"])
-        link = escape_xml(a["url"])
-        desc = escape_xml(a["description"][:500]) if a["description"] else ""
-        author = escape_xml(a["author"])
-        pub_date = format_rfc822(a["date"])
-        guid = link
-
-        thumbnail_xml = ""
-        if a.get("image"):
-            img = escape_xml(a["image"])
-            thumbnail_xml = (
-                f'      <media:content url="{img}" medium="image" type="image/jpeg"/>\n'
-                f'      <media:thumbnail url="{img}"/>\n'
-                f'      <enclosure url="{img}" type="image/jpeg" length="0"/>\n'
-            )
-
-        category_xml = ""
-        if a.get("category"):
-            category_xml = f"      <category>{escape_xml(a['category'])}</category>\n"
-
-        items.append(
-            f"""    <item>
+    category_xml = ""
+    if a.get("category"):
+        category_xml = f"      <category>{escape_xml(a['category'])}</category>\n"
+
+    return f"""    <item>
       <title>{title}</title>
       <link>{link}</link>
       <guid isPermaLink="true">{guid}</guid>
@@ -152,57 +199,73 @@ def build_rss(articles, feed_url):
       <dc:creator>{author}</dc:creator>
       <description>{desc}</description>
 {thumbnail_xml}{category_xml}    </item>"""
-        )
 
-    items_xml = "\n".join(items)
-
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
-<rss version="2.0"
-  xmlns:content="http://purl.org/rss/1.0/modules/content/"
-  xmlns:dc="http://purl.org/dc/elements/1.1/"
-  xmlns:atom="http://www.w3.org/2005/Atom"
-  xmlns:media="http://search.yahoo.com/mrss/">
-  <channel>
-    <title>Economic and Political Weekly</title>
-    <link>{escape_xml(EPW_URL)}</link>
-    <description>Economic and Political Weekly - India&apos;s premier social science journal since 1949</description>
-    <language>en</language>
-    <lastBuildDate>{now}</lastBuildDate>
-    <atom:link href="{escape_xml(feed_url)}" rel="self" type="application/rss+xml"/>
-{items_xml}
-  </channel>
-</rss>"""
+
+def iter_rss(articles, feed_url):
+    """Yield the feed in chunks, rendering one item at a time."""
+    items = metrics.timed("epw", "render", (render_item(a) for a in articles))
+    return rss_writer.iter_feed(
+        "Economic and Political Weekly",
+        EPW_URL,
+        "Economic and Political Weekly - India's premier social science journal since 1949",
+        feed_url,
+        items,
+    )
+
+
+def build_rss(articles, feed_url):
+    return "".join(iter_rss(articles, feed_url))
+
+
+def fetch_articles():
+    """Fetch the homepage and the metadata of every article it lists, in
+    homepage order. Raises if the homepage can't be fetched."""
+    with metrics.stage("epw", "fetch"):
+        urls = fetch_article_urls()
+    print(f"  Found {len(urls)} article URLs")
+
+    cache = article_cache.ArticleCache("epw_articles.json")
+    # Fetched concurrently, collected in homepage order
+    with metrics.stage("epw", "articles"):
+        metas = throttle.map_ordered(lambda path: fetch_article_meta(path, cache), urls)
+    cache.save()
+    print(f"  Reused cached metadata for {cache.hits} of {len(urls)} articles")
+    return [meta for meta in metas if meta]
 
 
 def main():
     os.makedirs(OUT_DIR, exist_ok=True)
     base_url = os.environ.get("BASE_URL", "").rstrip("/")
 
+    store = item_store.ItemStore("epw_store.json", lambda a: a["url"], lambda a: a.get("date", ""))
     print("Fetching EPW homepage...")
     try:
-        urls = fetch_article_urls()
+        articles = store.merge(fetch_articles())
     except Exception as e:
         print(f"  Failed to fetch EPW homepage: {e}")
-        print("  Skipping EPW feed generation")
-        return
-    print(f"  Found {len(urls)} article URLs")
-
-    articles = []
-    for path in urls:
-        print(f"  Fetching metadata: {path}")
-        meta = fetch_article_meta(path)
-        if meta:
-            articles.append(meta)
-
-    # Sort by date descending
-    articles.sort(key=lambda a: a.get("date", ""), reverse=True)
-
+        articles = store.items()
+        if not articles:
+            print("  Skipping EPW feed generation")
+            return False
+        print(f"  Serving the {len(articles)} articles from earlier runs")
+    store.save()
+
+    with metrics.stage("epw", "images"):
+        image_probe.PROBE.probe((a.get("image") for a in articles), "epw")
     feed_url = f"{base_url}/epw.xml" if base_url else "epw.xml"
-    rss = build_rss(articles, feed_url)
-    with open(os.path.join(OUT_DIR, "epw.xml"), "w", encoding="utf-8") as f:
-        f.write(rss)
-    print(f"Wrote epw.xml ({len(articles)} articles)")
+    with metrics.stage("epw", "write"):
+        written = rss_writer.write_feed(os.path.join(OUT_DIR, "epw.xml"), iter_rss(articles, feed_url))
+    if written:
+        print(f"Wrote epw.xml ({len(articles)} articles)")
+    else:
+        print(f"epw.xml unchanged ({len(articles)} articles)")
+    rss_writer.save_manifest()
+    image_probe.PROBE.save()
+    http_cache.prune()
+    return True
 
 
 if __name__ == "__main__":
     main()
+    compress.compress_dir(OUT_DIR)
+    metrics.write_report(OUT_DIR)
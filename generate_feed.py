@@ -1,22 +1,77 @@
 import datetime
+import hashlib
 import html
 import os
+import pathlib
 import re
 import shutil
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 import requests
 
+import budget
+import compress
+import http_cache
+import image_probe
+import metrics
+import rss_writer
+import scheduler
+import state
+
 WP_API = "https://cms.thewire.in/wp-json/wp/v2/posts"
 WP_CATEGORIES_API = "https://cms.thewire.in/wp-json/wp/v2/categories"
+WP_USERS_API = "https://cms.thewire.in/wp-json/wp/v2/users"
+WP_MEDIA_API = "https://cms.thewire.in/wp-json/wp/v2/media"
 SITE_URL = "https://thewire.in"
+# Number of category feeds fetched in parallel (1 = sequential)
+CONCURRENCY = max(1, int(os.environ.get("WIRE_CONCURRENCY", "8")))
+# "category" fetches every category feed separately; "crawl" pulls the most
+# recent posts once and builds the category feeds from their embedded terms;
+# "sync" does the same from a local post store that is updated incrementally
+FETCH_MODE = os.environ.get("WIRE_FETCH_MODE", "category")
+CRAWL_POSTS = int(os.environ.get("WIRE_CRAWL_POSTS", "300"))
+# Items in the main feed and in each category feed. The API returns at most
+# MAX_PER_PAGE posts per request; deeper feeds fetch the extra pages
+# concurrently, PAGE_CONCURRENCY at a time per feed
+FEED_ITEMS = int(os.environ.get("WIRE_FEED_ITEMS", "30"))
+CATEGORY_ITEMS = int(os.environ.get("WIRE_CATEGORY_ITEMS", "30"))
+MAX_PER_PAGE = 100
+PAGE_CONCURRENCY = max(1, int(os.environ.get("WIRE_PAGE_CONCURRENCY", "4")))
+SYNC_STORE_SIZE = int(os.environ.get("WIRE_SYNC_STORE_SIZE", "1000"))
+# Re-request a little before the last sync point so posts saved in the same
+# second as the watermark are not missed
+SYNC_OVERLAP = datetime.timedelta(minutes=5)
+# Rendered items are reused across feeds in a run and, unless disabled,
+# saved between runs (up to ITEM_CACHE_SIZE, least recently used dropped)
+ITEM_CACHE_PERSIST = os.environ.get("WIRE_ITEM_CACHE", "1") != "0"
+ITEM_CACHE_SIZE = int(os.environ.get("WIRE_ITEM_CACHE_SIZE", "1000"))
+# Lean fetches ask for only the post fields render_item reads instead of the
+# full _embed payload; authors, featured media and category names are looked
+# up separately in batches and cached between runs (up to LOOKUP_CACHE_SIZE each)
+LEAN_FETCH = os.environ.get("WIRE_LEAN_FETCH", "0") == "1"
+POST_FIELDS = "id,date,modified,link,guid,title,excerpt,content,author,categories,featured_media"
+LOOKUP_CACHE_SIZE = int(os.environ.get("WIRE_LOOKUP_CACHE_SIZE", "2000"))
+# In category mode, a category whose post count hasn't changed (and that has
+# no newer post in the main feed) keeps its existing feed without a request,
+# until it was last fetched more than CATEGORY_MAX_AGE seconds ago
+CATEGORY_STATE_NAME = "wire_category_state.json"
+CATEGORY_MAX_AGE = float(os.environ.get("WIRE_CATEGORY_MAX_AGE_HOURS", "6")) * 3600
 SESSION = requests.Session()
 SESSION.headers.update({"User-Agent": "TheWireRSS/1.0"})
+# Size the connection pool to match so parallel requests reuse connections
+http_cache.install(SESSION, pool_maxsize=CONCURRENCY * PAGE_CONCURRENCY)
+metrics.instrument(SESSION, "wire")
 FEED_TITLE = "The Wire"
 FEED_DESCRIPTION = (
     "The Wire - Independent journalism from India covering politics, "
     "economy, science, law, society, culture, and more."
 )
 OUT_DIR = os.path.join(os.path.dirname(__file__), "public")
+PLACEHOLDER_PATH = os.path.join(os.path.dirname(__file__), "placeholder.png")
+PLACEHOLDER_SIZE = os.path.getsize(PLACEHOLDER_PATH) if os.path.exists(PLACEHOLDER_PATH) else 0
 
 
 def strip_html(text):
@@ -31,24 +86,33 @@ def extract_first_image(html_content):
     return None
 
 
+# Markup dropped from feed content: script, noscript and style blocks, data-*
+# attributes (WP clutter), loading/decoding hints and srcset/sizes (src is enough)
+BLOCK = r"<script[^>]*>.*?</script>|<noscript[^>]*>.*?</noscript>|<style[^>]*>.*?</style>"
+ATTR = r'(?:data-\w+|loading|decoding|srcset|sizes)="[^"]*"'
+BLOCK_RE = re.compile(BLOCK, re.DOTALL)
+ATTR_RE = re.compile(rf"\s+{ATTR}")
+NEWLINES_RE = re.compile(r"\n{3,}")
+# One scan finds each stretch that needs changing: a run of blocks and
+# attributes with the whitespace around it, or a run of 3+ newlines. Runs are
+# short, so cleaning each on its own is cheap, and whitespace on both sides of
+# a removed block still collapses together. The lookahead skips plain text fast.
+CLEAN_RE = re.compile(
+    rf"(?=[<\s])(?:\s*(?:{BLOCK}|\s+{ATTR})(?:\s*(?:{BLOCK}|{ATTR}))*\s*|\n{{3,}})",
+    re.DOTALL,
+)
+
+
+def _clean_run(match):
+    run = match.group()
+    if not run.isspace():
+        run = ATTR_RE.sub("", BLOCK_RE.sub("", run))
+    return NEWLINES_RE.sub("\n\n", run)
+
+
 def clean_content(html_content):
     """Clean WordPress content for proper RSS display."""
-    # Remove script tags and their content
-    html_content = re.sub(r"<script[^>]*>.*?</script>", "", html_content, flags=re.DOTALL)
-    # Remove noscript tags
-    html_content = re.sub(r"<noscript[^>]*>.*?</noscript>", "", html_content, flags=re.DOTALL)
-    # Remove inline style tags
-    html_content = re.sub(r"<style[^>]*>.*?</style>", "", html_content, flags=re.DOTALL)
-    # Remove data-* attributes (WP clutter)
-    html_content = re.sub(r'\s+data-\w+="[^"]*"', "", html_content)
-    # Remove loading="lazy" and decoding="async" (not needed in feeds)
-    html_content = re.sub(r'\s+(?:loading|decoding)="[^"]*"', "", html_content)
-    # Remove srcset and sizes attributes (causes clutter, src is enough)
-    html_content = re.sub(r'\s+srcset="[^"]*"', "", html_content)
-    html_content = re.sub(r'\s+sizes="[^"]*"', "", html_content)
-    # Clean up excessive whitespace
-    html_content = re.sub(r"\n{3,}", "\n\n", html_content)
-    return html_content.strip()
+    return CLEAN_RE.sub(_clean_run, html_content).strip()
 
 
 def escape_xml(text):
@@ -66,18 +130,150 @@ def format_rfc822(dt_str):
     return dt.strftime("%a, %d %b %Y %H:%M:%S +0530")
 
 
-def fetch_posts(count=30, category_id=None):
+def fetch_posts_page(per_page, page=1, category_id=None, filters=None):
+    """Fetch one page of posts, returning (posts, total_pages)."""
     params = {
-        "per_page": count,
+        "per_page": per_page,
         "_embed": "author,wp:term,wp:featuredmedia",
         "orderby": "date",
         "order": "desc",
     }
+    if LEAN_FETCH:
+        del params["_embed"]
+        params["_fields"] = POST_FIELDS
+    if page > 1:
+        params["page"] = page
     if category_id:
         params["categories"] = category_id
+    if filters:
+        params.update(filters)
     resp = SESSION.get(WP_API, params=params, timeout=30)
     resp.raise_for_status()
-    return resp.json()
+    if LEAN_FETCH:
+        posts = embed_lookups(resp.json())
+    else:
+        posts = [slim_post(post) for post in resp.json()]
+    return posts, int(resp.headers.get("X-WP-TotalPages", page))
+
+
+def slim_post(post):
+    """Keep only the parts of an _embed post that are used here, in the same
+    shape as a lean fetch. Most of an embedded post is links, avatars and
+    image sizes, so this keeps deep feeds small in memory and in the sync store."""
+    embedded = post.get("_embedded", {})
+    slim = {key: post[key] for key in POST_FIELDS.split(",") if key in post}
+    slim["_embedded"] = {
+        "author": [
+            {key: author[key] for key in USERS.fields.split(",") if key in author}
+            for author in embedded.get("author", [])[:1]
+        ],
+        "wp:featuredmedia": [
+            {key: media[key] for key in MEDIA.fields.split(",") if key in media}
+            for media in embedded.get("wp:featuredmedia", [])[:1]
+        ],
+        "wp:term": [
+            [
+                {key: term[key] for key in CATEGORIES.fields.split(",") if key in term}
+                for term in group
+                if term.get("taxonomy") == "category"
+            ]
+            for group in embedded.get("wp:term", [])
+        ],
+    }
+    return slim
+
+
+def fetch_posts(count=FEED_ITEMS, category_id=None):
+    """Fetch the ``count`` most recent posts, in one request up to MAX_PER_PAGE."""
+    return fetch_recent_posts(count, category_id=category_id)
+
+
+def fetch_recent_posts(total, per_page=MAX_PER_PAGE, filters=None, category_id=None):
+    """Fetch up to ``total`` of the most recent posts (in ``category_id`` and
+    matching the optional query ``filters``).
+
+    The first page's X-WP-TotalPages says how many pages there are; the rest
+    that are needed are fetched concurrently. Pages are merged newest first
+    without duplicates, since a post published meanwhile shifts the later
+    pages and can show up on two of them.
+    """
+    per_page = min(per_page, total)
+    first, total_pages = fetch_posts_page(per_page, category_id=category_id, filters=filters)
+    pages = range(2, min(total_pages, -(-total // per_page)) + 1)
+
+    def fetch_page(page):
+        try:
+            return fetch_posts_page(per_page, page, category_id, filters)[0]
+        except requests.HTTPError as e:
+            # Deleted posts can make the last page disappear (rest_post_invalid_page_number)
+            if e.response is not None and e.response.status_code == 400:
+                return []
+            raise
+
+    posts = {post["id"]: post for post in first}
+    if pages:
+        with ThreadPoolExecutor(max_workers=min(PAGE_CONCURRENCY, len(pages))) as pool:
+            for batch in pool.map(fetch_page, pages):
+                for post in batch:
+                    posts.setdefault(post["id"], post)
+    return sorted(posts.values(), key=lambda post: post["date"], reverse=True)[:total]
+
+
+def sync_posts(store_name="wire_posts.json", max_posts=SYNC_STORE_SIZE):
+    """Bring the local store of the ``max_posts`` most recent posts up to date
+    and return its posts, newest first. Posts deleted or unpublished upstream
+    stay until newer posts push them out."""
+    store = state.load_json(store_name, {})
+    posts = store.get("posts", {})
+    if not posts:
+        print(f"  Post store is empty, fetching the {CRAWL_POSTS} most recent posts...")
+        changed = fetch_recent_posts(CRAWL_POSTS)
+    else:
+        modified_after = datetime.datetime.fromisoformat(store["watermark"]) - SYNC_OVERLAP
+        newest = max(datetime.datetime.fromisoformat(p["date"]) for p in posts.values())
+        # Scheduled posts go live without their modified time changing, so
+        # posts published after the newest stored one are asked for too
+        changed = fetch_recent_posts(
+            max_posts, filters={"modified_after": modified_after.isoformat()}
+        )
+        changed += fetch_recent_posts(
+            max_posts, filters={"after": (newest - SYNC_OVERLAP).isoformat()}
+        )
+    print(f"  Fetched {len(changed)} new or updated posts")
+    # Posts stored while a lookup was failing get their author, image and
+    # categories looked up again
+    unresolved = [post for post in posts.values() if post.get("_unresolved")]
+    if unresolved and LEAN_FETCH:
+        embed_lookups(unresolved)
+
+    for post in changed:
+        posts[str(post["id"])] = post
+    ordered = sorted(posts.values(), key=lambda p: p["date"], reverse=True)[:max_posts]
+    # With nothing stored and nothing fetched there is no watermark yet; the
+    # store is left as it was and the next run crawls again
+    if ordered:
+        state.save_json(
+            store_name,
+            {
+                "watermark": max(p["modified"] for p in ordered),
+                "posts": {str(p["id"]): p for p in ordered},
+            },
+        )
+    return ordered
+
+
+def index_by_category(posts):
+    """Map category id -> posts (newest first) using the embedded wp:term data."""
+    index = {}
+    for post in posts:
+        seen = set()
+        for term_group in post.get("_embedded", {}).get("wp:term", []):
+            for term in term_group:
+                if term.get("taxonomy") != "category" or term["id"] in seen:
+                    continue
+                seen.add(term["id"])
+                index.setdefault(term["id"], []).append(post)
+    return index
 
 
 def fetch_categories():
@@ -88,79 +284,289 @@ def fetch_categories():
     return resp.json()
 
 
-def build_rss(posts, feed_url, base_url="", title=FEED_TITLE, description=FEED_DESCRIPTION):
-    now = datetime.datetime.now(datetime.timezone.utc).strftime(
-        "%a, %d %b %Y %H:%M:%S +0000"
-    )
+class Lookup:
+    """Objects from a WP collection endpoint, fetched by id in batches with
+    ``include=`` and kept in an LRU cache that is saved between runs."""
 
-    items = []
-    for post in posts:
-        post_title = escape_xml(html.unescape(post["title"]["rendered"]))
-        link = escape_xml(post["link"])
-        pub_date = format_rfc822(post["date"])
-        post_description = escape_xml(
-            strip_html(html.unescape(post["excerpt"]["rendered"]))
-        )
-        content = post["content"]["rendered"]
-        guid = escape_xml(post["guid"]["rendered"])
-
-        author = "The Wire"
-        embedded = post.get("_embedded", {})
-        authors = embedded.get("author", [])
-        if authors and authors[0].get("name"):
-            author = escape_xml(authors[0]["name"])
-
-        # Extract featured image for thumbnail and hero image
-        thumbnail_xml = ""
-        hero_html = ""
-        featured_media = embedded.get("wp:featuredmedia", [])
-        if featured_media and featured_media[0].get("source_url"):
-            fm = featured_media[0]
-            img_url = fm["source_url"]
-            mime_type = fm.get("mime_type", "image/jpeg")
-            alt_text = fm.get("alt_text", "")
-            caption_html = fm.get("caption", {}).get("rendered", "")
-            caption_text = strip_html(caption_html) if caption_html else ""
-            # Thumbnail for RSS reader list view (both tags for broad reader support)
-            escaped_img = escape_xml(img_url)
-            thumbnail_xml = (
-                f'      <media:content url="{escaped_img}" medium="image" type="{mime_type}"/>\n'
-                f'      <media:thumbnail url="{escaped_img}"/>\n'
-                f'      <enclosure url="{escaped_img}" type="{mime_type}" length="0"/>\n'
+    BATCH = 100
+    # Ids the endpoint doesn't return (deleted media, hidden users) are asked
+    # for again after this long; failed requests aren't cached at all
+    MISSING_TTL = 86400
+
+    def __init__(self, url, fields, name=None, max_entries=LOOKUP_CACHE_SIZE):
+        self.url = url
+        self.fields = fields
+        self.name = name
+        self.max_entries = max_entries
+        self.entries = None
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if self.entries is None:
+            self.entries = OrderedDict(state.load_json(self.name, {}) if self.name else {})
+        return self.entries
+
+    def _known(self, key, now):
+        entry = self.entries.get(key)
+        if entry is None:
+            # Absent, or a bare None saved before missing ids expired
+            return False
+        return "_missing" not in entry or now - entry["_missing"] < self.MISSING_TTL
+
+    def get_many(self, ids):
+        """Return a dict mapping each id in ``ids`` (0 and None are ignored)
+        to its object, or None if the endpoint doesn't have it. Ids whose
+        lookup failed are left out of the dict."""
+        ids = {str(i) for i in ids if i}
+        now = time.time()
+        done = threading.Event()
+        with self.lock:
+            self._load()
+            # Ids another thread is already fetching are waited for, not refetched
+            waits = {self.pending[key] for key in ids if key in self.pending}
+            missing = sorted(
+                (key for key in ids if not self._known(key, now) and key not in self.pending), key=int
             )
-            # Hero image at top of content, matching The Wire's layout
-            hero_html = f'<figure style="margin:0 0 1.5em 0;"><img src="{img_url}" alt="{alt_text}" style="max-width:100%;height:auto;display:block;"/>'
-            if caption_text:
-                hero_html += f'<figcaption style="font-size:0.85em;color:#666;margin-top:0.4em;">{caption_text}</figcaption>'
-            hero_html += "</figure>\n"
+            for key in missing:
+                self.pending[key] = done
+        try:
+            for start in range(0, len(missing), self.BATCH):
+                batch = missing[start : start + self.BATCH]
+                found = self._fetch(batch)
+                if found is not None:
+                    with self.lock:
+                        for key in batch:
+                            self.entries[key] = found.get(int(key), {"_missing": now})
+        finally:
+            with self.lock:
+                for key in missing:
+                    del self.pending[key]
+            done.set()
+        for event in waits:
+            event.wait()
+
+        result = {}
+        with self.lock:
+            for key in ids:
+                entry = self.entries.get(key)
+                if entry is None:
+                    continue
+                self.entries.move_to_end(key)
+                result[int(key)] = None if "_missing" in entry else entry
+        return result
+
+    def _fetch(self, batch):
+        params = {"include": ",".join(batch), "per_page": len(batch), "_fields": self.fields}
+        try:
+            resp = SESSION.get(self.url, params=params, timeout=30)
+            resp.raise_for_status()
+            return {obj["id"]: obj for obj in resp.json()}
+        except (requests.RequestException, ValueError) as e:
+            print(f"    Lookup against {self.url} failed: {e}")
+            return None
+
+    def save(self):
+        if self.name and self.entries is not None:
+            with self.lock:
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                state.save_json(self.name, self.entries)
+
+
+USERS = Lookup(WP_USERS_API, "id,name", "wire_users.json")
+MEDIA = Lookup(WP_MEDIA_API, "id,source_url,mime_type,alt_text,caption", "wire_media.json")
+CATEGORIES = Lookup(WP_CATEGORIES_API, "id,name,taxonomy", "wire_categories.json")
+
+
+def embed_lookups(posts):
+    """Fill in ``_embedded`` for posts fetched with POST_FIELDS, in the shape
+    of the full _embed response, so the rest of the pipeline is unchanged.
+
+    A post whose author, image or categories couldn't be looked up is marked
+    ``_unresolved``: it is rendered without them for now, but its render is
+    not cached, and sync_posts looks it up again on the next run.
+    """
+    authors = USERS.get_many(post.get("author") for post in posts)
+    media = MEDIA.get_many(post.get("featured_media") for post in posts)
+    terms = CATEGORIES.get_many(c for post in posts for c in post.get("categories", []))
+    for post in posts:
+        wanted = [(authors, post.get("author")), (media, post.get("featured_media"))]
+        wanted += [(terms, c) for c in post.get("categories", [])]
+        if any(key and key not in found for found, key in wanted):
+            post["_unresolved"] = True
         else:
-            # Use The Wire logo as fallback thumbnail so RSS readers
-            # don't render an empty image preview placeholder.
-            placeholder_url = f"{base_url}/placeholder.png" if base_url else "placeholder.png"
-            escaped_ph = escape_xml(placeholder_url)
-            thumbnail_xml = (
-                f'      <media:content url="{escaped_ph}" medium="image" type="image/png"/>\n'
-                f'      <media:thumbnail url="{escaped_ph}"/>\n'
-                f'      <enclosure url="{escaped_ph}" type="image/png" length="0"/>\n'
-            )
+            post.pop("_unresolved", None)
+        embedded = {}
+        if authors.get(post.get("author")):
+            embedded["author"] = [authors[post["author"]]]
+        if media.get(post.get("featured_media")):
+            embedded["wp:featuredmedia"] = [media[post["featured_media"]]]
+        # The post's category ids come in the same (name) order as the embed
+        embedded["wp:term"] = [[terms[c] for c in post.get("categories", []) if terms.get(c)]]
+        post["_embedded"] = embedded
+    return posts
+
+
+def fetch_category_posts(categories, count=CATEGORY_ITEMS, concurrency=CONCURRENCY):
+    """Fetch posts for each category using a bounded worker pool, yielding
+    (category, posts, error) tuples in the order of ``categories``, at most
+    ``concurrency`` categories ahead of the consumer."""
+
+    def fetch_one(cat):
+        # Categories are the first work to stop when the run budget runs low,
+        # so callers pass the most popular first
+        if budget.expired(budget.CATEGORY_MARGIN, "wire"):
+            return cat, None, budget.BudgetExceeded()
+        try:
+            posts = fetch_posts(count, category_id=cat["id"])
+        except Exception as e:
+            return cat, None, e
+        # Probed here so probes overlap with the other categories' fetches
+        with metrics.stage("wire", "images"):
+            probe_images(posts)
+        return cat, posts, None
+
+    if concurrency <= 1:
+        yield from map(fetch_one, categories)
+        return
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = deque()
+        for cat in categories:
+            if len(pending) >= concurrency:
+                yield pending.popleft().result()
+            pending.append(pool.submit(fetch_one, cat))
+        while pending:
+            yield pending.popleft().result()
+
+
+def category_posts_from_index(categories, recent_posts, count=CATEGORY_ITEMS):
+    """Build per-category post lists from an already crawled set of posts.
+
+    ``recent_posts`` must be the newest posts site-wide, so any category with
+    at least ``count`` of them indexed already has its exact latest posts.
+    Categories that come up short (and have more posts than that in total)
+    are topped up with a targeted request. Returns the same (category, posts,
+    error) tuples as fetch_category_posts.
+    """
+    index = index_by_category(recent_posts)
+    results = {}
+    short = []
+    for cat in categories:
+        cat_posts = index.get(cat["id"], [])
+        if len(cat_posts) >= min(count, cat.get("count", count)):
+            results[cat["id"]] = (cat, cat_posts[:count], None)
+        else:
+            short.append(cat)
+    if short:
+        print(f"  Topping up {len(short)} categories with too few crawled posts...")
+        for cat, cat_posts, error in fetch_category_posts(short, count):
+            results[cat["id"]] = (cat, cat_posts, error)
+    return [results[cat["id"]] for cat in categories]
+
+
+def unchanged_categories(categories, saved, recent_posts, max_age=CATEGORY_MAX_AGE):
+    """Return the ids of the categories whose post count and newest post in
+    ``recent_posts`` match ``saved`` and which were fetched within ``max_age``."""
+    newest = {
+        cat_id: max(post["id"] for post in cat_posts)
+        for cat_id, cat_posts in index_by_category(recent_posts).items()
+    }
+    now = time.time()
+    unchanged = set()
+    for cat in categories:
+        entry = saved.get(str(cat["id"]))
+        if (
+            entry
+            and entry["count"] == cat.get("count")
+            and newest.get(cat["id"], 0) <= entry["newest"]
+            and now - entry["fetched"] < max_age
+        ):
+            unchanged.add(cat["id"])
+    return unchanged
 
-        # Clean and prepare the article content
-        content = clean_content(content)
-        full_content = hero_html + content
-
-        categories_xml = ""
-        terms = embedded.get("wp:term", [])
-        if terms:
-            for term_group in terms:
-                for term in term_group:
-                    if term.get("taxonomy") == "category":
-                        cat_name = escape_xml(html.unescape(term["name"]))
-                        categories_xml += (
-                            f"      <category>{cat_name}</category>\n"
-                        )
-
-        items.append(
-            f"""    <item>
+
+def featured_image(post):
+    """Return the post's embedded featured media, or None if it has no image."""
+    media = post.get("_embedded", {}).get("wp:featuredmedia", [])
+    if media and media[0].get("source_url"):
+        return media[0]
+    return None
+
+
+def probe_images(posts):
+    """Probe the featured images of ``posts`` that haven't been probed yet."""
+    images = (featured_image(post) for post in posts)
+    image_probe.PROBE.probe((image["source_url"] for image in images if image), "wire")
+
+
+def render_item(post, base_url=""):
+    post_title = escape_xml(html.unescape(post["title"]["rendered"]))
+    link = escape_xml(post["link"])
+    pub_date = format_rfc822(post["date"])
+    post_description = escape_xml(
+        strip_html(html.unescape(post["excerpt"]["rendered"]))
+    )
+    content = post["content"]["rendered"]
+    guid = escape_xml(post["guid"]["rendered"])
+
+    author = "The Wire"
+    embedded = post.get("_embedded", {})
+    authors = embedded.get("author", [])
+    if authors and authors[0].get("name"):
+        author = escape_xml(authors[0]["name"])
+
+    # Extract featured image for thumbnail and hero image
+    thumbnail_xml = ""
+    hero_html = ""
+    fm = featured_image(post)
+    if fm:
+        img_url = fm["source_url"]
+        length, mime_type = image_probe.PROBE.describe(img_url, fm.get("mime_type", "image/jpeg"))
+        file_size = f' fileSize="{length}"' if length else ""
+        alt_text = fm.get("alt_text", "")
+        caption_html = fm.get("caption", {}).get("rendered", "")
+        caption_text = strip_html(caption_html) if caption_html else ""
+        # Thumbnail for RSS reader list view (both tags for broad reader support)
+        escaped_img = escape_xml(img_url)
+        thumbnail_xml = (
+            f'      <media:content url="{escaped_img}" medium="image" type="{mime_type}"{file_size}/>\n'
+            f'      <media:thumbnail url="{escaped_img}"/>\n'
+            f'      <enclosure url="{escaped_img}" type="{mime_type}" length="{length}"/>\n'
+        )
+        # Hero image at top of content, matching The Wire's layout
+        hero_html = f'<figure style="margin:0 0 1.5em 0;"><img src="{img_url}" alt="{alt_text}" style="max-width:100%;height:auto;display:block;"/>'
+        if caption_text:
+            hero_html += f'<figcaption style="font-size:0.85em;color:#666;margin-top:0.4em;">{caption_text}</figcaption>'
+        hero_html += "</figure>\n"
+    else:
+        # Use The Wire logo as fallback thumbnail so RSS readers
+        # don't render an empty image preview placeholder.
+        placeholder_url = f"{base_url}/placeholder.png" if base_url else "placeholder.png"
+        escaped_ph = escape_xml(placeholder_url)
+        ph_size = f' fileSize="{PLACEHOLDER_SIZE}"' if PLACEHOLDER_SIZE else ""
+        thumbnail_xml = (
+            f'      <media:content url="{escaped_ph}" medium="image" type="image/png"{ph_size}/>\n'
+            f'      <media:thumbnail url="{escaped_ph}"/>\n'
+            f'      <enclosure url="{escaped_ph}" type="image/png" length="{PLACEHOLDER_SIZE}"/>\n'
+        )
+
+    # Clean and prepare the article content
+    content = clean_content(content)
+    full_content = hero_html + content
+
+    categories_xml = ""
+    terms = embedded.get("wp:term", [])
+    if terms:
+        for term_group in terms:
+            for term in term_group:
+                if term.get("taxonomy") == "category":
+                    cat_name = escape_xml(html.unescape(term["name"]))
+                    categories_xml += (
+                        f"      <category>{cat_name}</category>\n"
+                    )
+
+    return f"""    <item>
       <title>{post_title}</title>
       <link>{link}</link>
       <guid isPermaLink="false">{guid}</guid>
@@ -169,33 +575,118 @@ def build_rss(posts, feed_url, base_url="", title=FEED_TITLE, description=FEED_D
       <description>{post_description}</description>
       <content:encoded><![CDATA[{full_content}]]></content:encoded>
 {thumbnail_xml}{categories_xml}    </item>"""
-        )
 
-    items_xml = "\n".join(items)
-
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
-<rss version="2.0"
-  xmlns:content="http://purl.org/rss/1.0/modules/content/"
-  xmlns:dc="http://purl.org/dc/elements/1.1/"
-  xmlns:atom="http://www.w3.org/2005/Atom"
-  xmlns:media="http://search.yahoo.com/mrss/">
-  <channel>
-    <title>{escape_xml(title)}</title>
-    <link>{escape_xml(SITE_URL)}</link>
-    <description>{escape_xml(description)}</description>
-    <language>en</language>
-    <lastBuildDate>{now}</lastBuildDate>
-    <atom:link href="{escape_xml(feed_url)}" rel="self" type="application/rss+xml"/>
-{items_xml}
-  </channel>
-</rss>"""
-
-
-def build_index(base_url, category_feeds):
+
+class ItemCache:
+    """LRU cache of rendered <item> fragments, saved to ``name`` in the cache
+    directory when given."""
+
+    # Saved renders are dropped when this module or the placeholder size changes
+    VERSION = hashlib.sha256(
+        pathlib.Path(__file__).read_bytes() + f"|{PLACEHOLDER_SIZE}".encode()
+    ).hexdigest()
+
+    def __init__(self, max_entries=ITEM_CACHE_SIZE, name=None):
+        self.max_entries = max_entries
+        self.name = name
+        self.items = OrderedDict()
+        if name:
+            saved = state.load_json(name, {})
+            if saved.get("version") == self.VERSION:
+                self.items.update(saved["items"])
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, post, base_url=""):
+        image = featured_image(post)
+        enclosure = image_probe.PROBE.describe(image["source_url"], "") if image else ""
+        # An edited post, or one whose image has since been probed, renders again
+        key = f"{post['id']}|{post.get('modified', '')}|{base_url}|{enclosure}"
+        with self.lock:
+            item = self.items.get(key)
+            if item is not None:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return item
+        item = render_item(post, base_url)
+        with self.lock:
+            self.misses += 1
+            if post.get("_unresolved"):
+                # Rendered without a failed lookup; an earlier good render of
+                # the same post is still used, but this one isn't kept
+                return item
+            self.items[key] = item
+            while len(self.items) > self.max_entries:
+                self.items.popitem(last=False)
+        return item
+
+    def save(self):
+        if self.name:
+            state.save_json(self.name, {"version": self.VERSION, "items": self.items})
+
+
+def iter_rss(
+    posts, feed_url, base_url="", title=FEED_TITLE, description=FEED_DESCRIPTION, cache=None
+):
+    """Yield the feed in chunks, rendering one item at a time."""
+    render = cache.render if cache is not None else render_item
+    items = metrics.timed("wire", "render", (render(post, base_url) for post in posts))
+    return rss_writer.iter_feed(title, SITE_URL, description, feed_url, items)
+
+
+def build_rss(
+    posts, feed_url, base_url="", title=FEED_TITLE, description=FEED_DESCRIPTION, cache=None
+):
+    return "".join(iter_rss(posts, feed_url, base_url, title, description, cache))
+
+
+def build_index(base_url, category_feeds, sources=None):
+    """Build the directory page. ``sources`` is the set of feed files to show
+    cards for (e.g. only those generated successfully); None shows them all."""
     cat_links = "\n".join(
         f'              <li><a href="{slug}.xml" onclick="copyFeed(event, \'{base_url}/{slug}.xml\')"><span class="rss-icon">&#9673;</span> {name}</a></li>'
         for slug, name in sorted(category_feeds, key=lambda x: x[1])
     )
+    cards = {
+        "feed.xml": f"""        <div class="feed-card">
+          <h3>The Wire</h3>
+          <div class="desc">Independent news and opinion from India</div>
+          <div class="feed-links">
+            <a href="feed.xml" onclick="copyFeed(event, '{base_url}/feed.xml')"><span class="rss-icon">&#9673;</span> feed.xml</a>
+          </div>
+          <details class="wire-categories">
+            <summary>Category feeds ({len(category_feeds)})</summary>
+            <ul>
+{cat_links}
+            </ul>
+          </details>
+        </div>""",
+        "scroll.xml": f"""        <div class="feed-card">
+          <h3>Scroll Newsletter</h3>
+          <div class="desc">Daily news briefing from Scroll.in</div>
+          <div class="feed-links">
+            <a href="scroll.xml" onclick="copyFeed(event, '{base_url}/scroll.xml')"><span class="rss-icon">&#9673;</span> scroll.xml</a>
+          </div>
+        </div>""",
+        "caravan.xml": f"""        <div class="feed-card">
+          <h3>The Caravan</h3>
+          <div class="desc">Long-form journalism on politics and culture</div>
+          <div class="feed-links">
+            <a href="caravan.xml" onclick="copyFeed(event, '{base_url}/caravan.xml')"><span class="rss-icon">&#9673;</span> caravan.xml</a>
+          </div>
+        </div>""",
+        "epw.xml": f"""        <div class="feed-card">
+          <h3>Economic &amp; Political Weekly</h3>
+          <div class="desc">India's premier social science journal since 1949</div>
+          <div class="feed-links">
+            <a href="epw.xml" onclick="copyFeed(event, '{base_url}/epw.xml')"><span class="rss-icon">&#9673;</span> epw.xml</a>
+          </div>
+        </div>""",
+    }
+    feed_cards = "\n\n".join(
+        card for name, card in cards.items() if sources is None or name in sources
+    )
     return f"""<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -413,43 +904,7 @@ def build_index(base_url, category_feeds):
       </div>
 
       <div class="feed-grid">
-        <div class="feed-card">
-          <h3>The Wire</h3>
-          <div class="desc">Independent news and opinion from India</div>
-          <div class="feed-links">
-            <a href="feed.xml" onclick="copyFeed(event, '{base_url}/feed.xml')"><span class="rss-icon">&#9673;</span> feed.xml</a>
-          </div>
-          <details class="wire-categories">
-            <summary>Category feeds ({len(category_feeds)})</summary>
-            <ul>
-{cat_links}
-            </ul>
-          </details>
-        </div>
-
-        <div class="feed-card">
-          <h3>Scroll Newsletter</h3>
-          <div class="desc">Daily news briefing from Scroll.in</div>
-          <div class="feed-links">
-            <a href="scroll.xml" onclick="copyFeed(event, '{base_url}/scroll.xml')"><span class="rss-icon">&#9673;</span> scroll.xml</a>
-          </div>
-        </div>
-
-        <div class="feed-card">
-          <h3>The Caravan</h3>
-          <div class="desc">Long-form journalism on politics and culture</div>
-          <div class="feed-links">
-            <a href="caravan.xml" onclick="copyFeed(event, '{base_url}/caravan.xml')"><span class="rss-icon">&#9673;</span> caravan.xml</a>
-          </div>
-        </div>
-
-        <div class="feed-card">
-          <h3>Economic &amp; Political Weekly</h3>
-          <div class="desc">India's premier social science journal since 1949</div>
-          <div class="feed-links">
-            <a href="epw.xml" onclick="copyFeed(event, '{base_url}/epw.xml')"><span class="rss-icon">&#9673;</span> epw.xml</a>
-          </div>
-        </div>
+{feed_cards}
       </div>
     </div>
 
@@ -489,65 +944,167 @@ def build_index(base_url, category_feeds):
 </html>"""
 
 
-def main():
+def write_index(base_url, category_feeds, sources=None):
+    index_html = build_index(base_url, category_feeds, sources)
+    path = os.path.join(OUT_DIR, "index.html")
+    # Leave an identical page untouched so its compressed copies stay valid
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.read() == index_html:
+                print("index.html unchanged")
+                return
+    except OSError:
+        pass
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(index_html)
+    print("Wrote index.html")
+
+
+def main(index=True):
+    """Generate the main and category feeds, returning the (slug, name) pairs
+    of the category feeds written. The index page is written unless ``index``
+    is False (the caller then writes it once every source has finished)."""
     os.makedirs(OUT_DIR, exist_ok=True)
 
     # Copy static assets
-    script_dir = os.path.dirname(__file__)
-    placeholder_src = os.path.join(script_dir, "placeholder.png")
-    if os.path.exists(placeholder_src):
-        shutil.copy2(placeholder_src, os.path.join(OUT_DIR, "placeholder.png"))
+    if os.path.exists(PLACEHOLDER_PATH):
+        shutil.copy2(PLACEHOLDER_PATH, os.path.join(OUT_DIR, "placeholder.png"))
 
     # Determine base URL from environment or default
     base_url = os.environ.get("BASE_URL", "").rstrip("/")
 
     # Generate main feed
-    print("Fetching main feed...")
-    posts = fetch_posts(30)
+    with metrics.stage("wire", "fetch"):
+        if FETCH_MODE == "sync":
+            print("Syncing post store...")
+            recent_posts = sync_posts()
+            posts = recent_posts[:FEED_ITEMS]
+        elif FETCH_MODE == "crawl":
+            crawl = max(CRAWL_POSTS, FEED_ITEMS)
+            print(f"Crawling the {crawl} most recent posts...")
+            recent_posts = fetch_recent_posts(crawl)
+            posts = recent_posts[:FEED_ITEMS]
+        else:
+            print("Fetching main feed...")
+            posts = fetch_posts(FEED_ITEMS)
+    with metrics.stage("wire", "images"):
+        probe_images(posts)
     feed_url = f"{base_url}/feed.xml" if base_url else "feed.xml"
-    rss = build_rss(posts, feed_url, base_url=base_url)
-    with open(os.path.join(OUT_DIR, "feed.xml"), "w", encoding="utf-8") as f:
-        f.write(rss)
-    print(f"  Wrote feed.xml ({len(posts)} posts)")
+    item_cache = ItemCache(name="wire_items.json" if ITEM_CACHE_PERSIST else None)
+    with metrics.stage("wire", "write"):
+        written = rss_writer.write_feed(
+            os.path.join(OUT_DIR, "feed.xml"),
+            iter_rss(posts, feed_url, base_url=base_url, cache=item_cache),
+        )
+    if written:
+        print(f"  Wrote feed.xml ({len(posts)} posts)")
+    else:
+        print(f"  feed.xml unchanged ({len(posts)} posts)")
 
     # Fetch categories and generate per-category feeds
     print("Fetching categories...")
-    categories = fetch_categories()
+    with metrics.stage("wire", "categories"):
+        categories = fetch_categories()
     # Filter to categories with a reasonable number of posts
     categories = [c for c in categories if c.get("count", 0) > 10]
     print(f"  Found {len(categories)} categories")
 
-    category_feeds = []
-    for cat in categories:
+    category_state = {}
+    skipped = []
+    with metrics.stage("wire", "category_posts"):
+        if FETCH_MODE in ("crawl", "sync"):
+            results = category_posts_from_index(categories, recent_posts, CATEGORY_ITEMS)
+            # Already in memory, so their images are probed in one batch
+            with metrics.stage("wire", "images"):
+                probe_images(post for _, cat_posts, error in results if error is None for post in cat_posts)
+        else:
+            category_state = state.load_json(CATEGORY_STATE_NAME, {})
+            if scheduler.ENABLED:
+                # The schedule decides how long a quiet category can go unfetched
+                unchanged = unchanged_categories(categories, category_state, posts, float("inf"))
+                unchanged -= {
+                    cat["id"] for cat in categories if scheduler.SCHEDULE.due(f"wire:{cat['slug']}")
+                }
+            else:
+                unchanged = unchanged_categories(categories, category_state, posts)
+            skipped = [
+                cat
+                for cat in categories
+                if cat["id"] in unchanged and os.path.exists(os.path.join(OUT_DIR, f"{cat['slug']}.xml"))
+            ]
+            # Most popular first, so those are the ones fetched if time runs short
+            stale = sorted(
+                (cat for cat in categories if cat not in skipped),
+                key=lambda cat: cat.get("count", 0),
+                reverse=True,
+            )
+            print(
+                f"  Fetching {len(stale)} category feeds ({CONCURRENCY} at a time), "
+                f"{len(skipped)} unchanged..."
+            )
+            # Lazy: each category is fetched as the loop below gets to it
+            results = fetch_category_posts(stale, CATEGORY_ITEMS)
+
+    # Each category is written as soon as its posts arrive and then dropped
+    category_feeds = [(cat["slug"], html.unescape(cat["name"])) for cat in skipped]
+    out_of_time = 0
+    for cat, cat_posts, error in metrics.timed("wire", "category_posts", results):
         slug = cat["slug"]
         name = html.unescape(cat["name"])
-        cat_id = cat["id"]
-        print(f"  Fetching category: {name} ({slug})...")
-        try:
-            cat_posts = fetch_posts(30, category_id=cat_id)
-        except Exception as e:
-            print(f"    Error fetching {slug}: {e}")
+        if isinstance(error, budget.BudgetExceeded):
+            out_of_time += 1
+            # Keep serving last run's feed for a category there was no time for
+            if os.path.exists(os.path.join(OUT_DIR, f"{slug}.xml")):
+                category_feeds.append((slug, name))
+            continue
+        if error is not None:
+            print(f"    Error fetching {slug}: {error}")
             continue
         cat_feed_url = f"{base_url}/{slug}.xml" if base_url else f"{slug}.xml"
-        cat_rss = build_rss(
+        cat_rss = iter_rss(
             cat_posts,
             cat_feed_url,
             base_url=base_url,
             title=f"The Wire - {name}",
             description=f"Latest articles from The Wire in the {name} category.",
+            cache=item_cache,
         )
-        with open(os.path.join(OUT_DIR, f"{slug}.xml"), "w", encoding="utf-8") as f:
-            f.write(cat_rss)
+        with metrics.stage("wire", "write"):
+            written = rss_writer.write_feed(os.path.join(OUT_DIR, f"{slug}.xml"), cat_rss)
+        if written:
+            print(f"    Wrote {slug}.xml ({len(cat_posts)} posts)")
+        else:
+            print(f"    {slug}.xml unchanged ({len(cat_posts)} posts)")
         category_feeds.append((slug, name))
-        print(f"    Wrote {slug}.xml ({len(cat_posts)} posts)")
+        category_state[str(cat["id"])] = {
+            "count": cat.get("count"),
+            "newest": max((post["id"] for post in cat_posts), default=0),
+            "fetched": time.time(),
+        }
+        scheduler.SCHEDULE.record(f"wire:{slug}", [post["guid"]["rendered"] for post in cat_posts])
+    if out_of_time:
+        print(f"  Out of time budget: skipped {out_of_time} categories, keeping their existing feeds")
+
+    item_cache.save()
+    if FETCH_MODE not in ("crawl", "sync"):
+        state.save_json(CATEGORY_STATE_NAME, category_state)
+    scheduler.SCHEDULE.save()
+    if LEAN_FETCH:
+        for lookup in (USERS, MEDIA, CATEGORIES):
+            lookup.save()
+    rss_writer.save_manifest()
+    image_probe.PROBE.save()
+    print(f"  Rendered {item_cache.misses} items, reused {item_cache.hits}")
 
     # Generate index page
-    index_html = build_index(base_url, category_feeds)
-    with open(os.path.join(OUT_DIR, "index.html"), "w", encoding="utf-8") as f:
-        f.write(index_html)
-    print("Wrote index.html")
+    if index:
+        write_index(base_url, category_feeds)
+    http_cache.prune()
     print("Done!")
+    return category_feeds
 
 
 if __name__ == "__main__":
     main()
+    compress.compress_dir(OUT_DIR)
+    metrics.write_report(OUT_DIR)
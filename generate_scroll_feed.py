@@ -5,9 +5,18 @@ import re
 
 import requests
 
+import compress
+import http_cache
+import image_probe
+import item_store
+import metrics
+import rss_writer
+
 SCROLL_URL = "https://scroll-newsletter.stck.me/"
 SESSION = requests.Session()
 SESSION.headers.update({"User-Agent": "ScrollRSS/1.0"})
+http_cache.install(SESSION)
+metrics.instrument(SESSION, "scroll")
 OUT_DIR = os.path.join(os.path.dirname(__file__), "public")
 
 
@@ -35,46 +44,69 @@ def fetch_posts():
     return state["siteContent"]["mixedPosts"]["content"]
 
 
-def build_rss(posts, feed_url, base_url=""):
-    now = datetime.datetime.now(datetime.timezone.utc).strftime(
-        "%a, %d %b %Y %H:%M:%S +0000"
-    )
+def post_link(post):
+    return post.get("permalink", f"{SCROLL_URL}post/{post.get('id', '')}")
+
 
-    items = []
-    for post in posts:
-        title = escape_xml(post.get("title", "Untitled"))
-        link = escape_xml(
-            post.get("permalink", f"{SCROLL_URL}post/{post.get('id', '')}")
+def published_at(post):
+    """Sort key for the item store: the publish time as a UTC ISO string, or
+    "" if it can't be parsed. A naive time is taken as UTC, as render_item
+    does. Posts with equal keys stay in page order."""
+    try:
+        dt = datetime.datetime.fromisoformat(post.get("published", ""))
+    except (ValueError, TypeError):
+        return ""
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return dt.isoformat()
+
+
+def stored_post(post):
+    """The fields of ``post`` that render_item reads, so the item store
+    doesn't keep each post's full page state."""
+    stored = {key: post[key] for key in ("id", "title", "permalink", "summary", "published") if key in post}
+    author = post.get("author", {})
+    if isinstance(author, dict) and author.get("name"):
+        stored["author"] = {"name": author["name"]}
+    image = post.get("meta", {}).get("cover", {}).get("src", {}).get("image")
+    if image:
+        stored["meta"] = {"cover": {"src": {"image": image}}}
+    return stored
+
+
+def render_item(post):
+    title = escape_xml(post.get("title", "Untitled"))
+    link = escape_xml(post_link(post))
+    summary = escape_xml(post.get("summary", ""))
+
+    pub_date = ""
+    published = post.get("published", "")
+    if published:
+        try:
+            dt = datetime.datetime.fromisoformat(published)
+            pub_date = dt.strftime("%a, %d %b %Y %H:%M:%S +0000")
+        except (ValueError, AttributeError):
+            pass
+
+    author = "Scroll"
+    author_data = post.get("author", {})
+    if isinstance(author_data, dict) and author_data.get("name"):
+        author = escape_xml(author_data["name"])
+
+    thumbnail_xml = ""
+    cover_src = post.get("meta", {}).get("cover", {}).get("src", {})
+    img_url = cover_src.get("image", "")
+    if img_url:
+        escaped_img = escape_xml(img_url)
+        length, img_type = image_probe.PROBE.describe(img_url, "image/jpeg")
+        file_size = f' fileSize="{length}"' if length else ""
+        thumbnail_xml = (
+            f'      <media:content url="{escaped_img}" medium="image" type="{img_type}"{file_size}/>\n'
+            f'      <media:thumbnail url="{escaped_img}"/>\n'
+            f'      <enclosure url="{escaped_img}" type="{img_type}" length="{length}"/>\n'
         )
-        summary = escape_xml(post.get("summary", ""))
-
-        pub_date = ""
-        published = post.get("published", "")
-        if published:
-            try:
-                dt = datetime.datetime.fromisoformat(published)
-                pub_date = dt.strftime("%a, %d %b %Y %H:%M:%S +0000")
-            except (ValueError, AttributeError):
-                pass
-
-        author = "Scroll"
-        author_data = post.get("author", {})
-        if isinstance(author_data, dict) and author_data.get("name"):
-            author = escape_xml(author_data["name"])
-
-        thumbnail_xml = ""
-        cover_src = post.get("meta", {}).get("cover", {}).get("src", {})
-        img_url = cover_src.get("image", "")
-        if img_url:
-            escaped_img = escape_xml(img_url)
-            thumbnail_xml = (
-                f'      <media:content url="{escaped_img}" medium="image" type="image/jpeg"/>\n'
-                f'      <media:thumbnail url="{escaped_img}"/>\n'
-                f'      <enclosure url="{escaped_img}" type="image/jpeg" length="0"/>\n'
-            )
-
-        items.append(
-            f"""    <item>
+
+    return f"""    <item>
       <title>{title}</title>
       <link>{link}</link>
       <guid isPermaLink="true">{link}</guid>
@@ -82,45 +114,62 @@ def build_rss(posts, feed_url, base_url=""):
       <dc:creator>{author}</dc:creator>
       <description>{summary}</description>
 {thumbnail_xml}    </item>"""
-        )
 
-    items_xml = "\n".join(items)
-
-    return f"""<?xml version="1.0" encoding="UTF-8"?>
-<rss version="2.0"
-  xmlns:content="http://purl.org/rss/1.0/modules/content/"
-  xmlns:dc="http://purl.org/dc/elements/1.1/"
-  xmlns:atom="http://www.w3.org/2005/Atom"
-  xmlns:media="http://search.yahoo.com/mrss/">
-  <channel>
-    <title>Scroll Newsletter</title>
-    <link>{escape_xml(SCROLL_URL)}</link>
-    <description>Daily news briefing from Scroll.in</description>
-    <language>en</language>
-    <lastBuildDate>{now}</lastBuildDate>
-    <atom:link href="{escape_xml(feed_url)}" rel="self" type="application/rss+xml"/>
-{items_xml}
-  </channel>
-</rss>"""
+
+def iter_rss(posts, feed_url, base_url=""):
+    """Yield the feed in chunks, rendering one item at a time."""
+    items = metrics.timed("scroll", "render", (render_item(post) for post in posts))
+    return rss_writer.iter_feed(
+        "Scroll Newsletter",
+        SCROLL_URL,
+        "Daily news briefing from Scroll.in",
+        feed_url,
+        items,
+    )
+
+
+def build_rss(posts, feed_url, base_url=""):
+    return "".join(iter_rss(posts, feed_url, base_url))
 
 
 def main():
     os.makedirs(OUT_DIR, exist_ok=True)
     base_url = os.environ.get("BASE_URL", "").rstrip("/")
 
+    store = item_store.ItemStore("scroll_store.json", post_link, published_at)
     print("Fetching Scroll newsletter...")
     try:
-        posts = fetch_posts()
+        with metrics.stage("scroll", "fetch"):
+            posts = store.merge([stored_post(post) for post in fetch_posts()])
     except Exception as e:
         print(f"  Failed to fetch Scroll newsletter: {e}")
-        print("  Skipping Scroll feed generation")
-        return
+        posts = store.items()
+        if not posts:
+            print("  Skipping Scroll feed generation")
+            return False
+        print(f"  Serving the {len(posts)} posts from earlier runs")
+    store.save()
+    with metrics.stage("scroll", "images"):
+        image_probe.PROBE.probe(
+            (post.get("meta", {}).get("cover", {}).get("src", {}).get("image") for post in posts),
+            "scroll",
+        )
     feed_url = f"{base_url}/scroll.xml" if base_url else "scroll.xml"
-    rss = build_rss(posts, feed_url, base_url=base_url)
-    with open(os.path.join(OUT_DIR, "scroll.xml"), "w", encoding="utf-8") as f:
-        f.write(rss)
-    print(f"Wrote scroll.xml ({len(posts)} posts)")
+    with metrics.stage("scroll", "write"):
+        written = rss_writer.write_feed(
+            os.path.join(OUT_DIR, "scroll.xml"), iter_rss(posts, feed_url, base_url=base_url)
+        )
+    if written:
+        print(f"Wrote scroll.xml ({len(posts)} posts)")
+    else:
+        print(f"scroll.xml unchanged ({len(posts)} posts)")
+    rss_writer.save_manifest()
+    image_probe.PROBE.save()
+    http_cache.prune()
+    return True
 
 
 if __name__ == "__main__":
     main()
+    compress.compress_dir(OUT_DIR)
+    metrics.write_report(OUT_DIR)
@@ -0,0 +1,71 @@
+"""Streaming page fetches that stop once the needed markup has been read.
+
+Caravan and EPW read article pages only for metadata near the top of the
+page. ``fetch_text`` streams the body in chunks and closes the connection as
+soon as the caller's ``done`` check passes, or reads to the end if it never
+does. Streamed requests bypass the HTTP cache, since a partial body can't
+be stored. Parsed article metadata is cached separately in article_cache.
+"""
+
+import codecs
+import os
+import time
+
+ENABLED = os.environ.get("HEAD_FETCH", "1") != "0"
+CHUNK_SIZE = 16 * 1024
+HEAD_END = "</head>"
+
+
+def fetch_text(session, url, done, timeout=30, chunk_size=CHUNK_SIZE):
+    """GET ``url`` and return the decoded page, or as much of it as was read
+    before ``done(text)`` returned True. Raises for HTTP errors like
+    ``raise_for_status``.
+
+    Every caller needs all of <head>, so ``done`` is first checked once
+    ``</head>`` has been read. After that it is checked again only each time
+    the page has grown by half. That keeps the total time spent in ``done``
+    linear in the page size, even when a check that rescans the page never
+    passes and the whole page is read.
+    """
+    if not ENABLED:
+        resp = session.get(url, timeout=timeout)
+        resp.raise_for_status()
+        return resp.text
+
+    start = time.perf_counter()
+    resp = session.get(url, timeout=timeout, stream=True)
+    with resp:
+        resp.raise_for_status()
+        decoder = codecs.getincrementaldecoder(resp.encoding or "utf-8")(errors="replace")
+        parts = []
+        size = 0
+        read = 0
+        tail = ""
+        next_check = None
+        for chunk in resp.iter_content(chunk_size):
+            read += len(chunk)
+            piece = decoder.decode(chunk)
+            parts.append(piece)
+            size += len(piece)
+            if next_check is None:
+                # Only the new text is searched, plus enough of the previous
+                # text to catch a tag split across chunks
+                if HEAD_END not in tail + piece:
+                    tail = (tail + piece)[-len(HEAD_END) :]
+                    continue
+                next_check = size
+            if size >= next_check:
+                text = "".join(parts)
+                parts = [text]
+                if done(text):
+                    break
+                next_check = size + size // 2
+        else:
+            parts.append(decoder.decode(b"", final=True))
+        text = "".join(parts)
+    # Report what was actually downloaded rather than the full Content-Length
+    entry = getattr(resp, "metrics_entry", None)
+    if entry is not None:
+        entry["bytes"] = read
+        entry["seconds"] = round(time.perf_counter() - start, 4)
+    return text
@@ -0,0 +1,166 @@
+"""On-disk HTTP cache using conditional requests, shared by all generators.
+
+Responses that carry an ETag or Last-Modified validator are stored under the
+cache directory keyed by their full URL (including query parameters). The next
+request for the same URL sends If-None-Match / If-Modified-Since, and a 304
+reply is answered from the stored body so callers see an ordinary 200.
+"""
+
+import hashlib
+import json
+import os
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+import http_client
+import state
+
+ENABLED = os.environ.get("HTTP_CACHE", "1") != "0"
+CACHE_DIR = state.cache_path("http")
+MAX_BYTES = int(float(os.environ.get("HTTP_CACHE_MAX_MB", "200")) * 1024 * 1024)
+MAX_AGE = float(os.environ.get("HTTP_CACHE_MAX_AGE_DAYS", "7")) * 86400
+
+# Headers describing the original transfer rather than the stored body
+SKIP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def _entry_paths(url):
+    key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, key + ".json"), os.path.join(CACHE_DIR, key + ".body")
+
+
+def _load(url):
+    meta_path, body_path = _entry_paths(url)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = f.read()
+    except (OSError, ValueError):
+        return None
+    if meta.get("url") != url:
+        return None
+    return meta, body
+
+
+def _store(url, resp):
+    meta_path, body_path = _entry_paths(url)
+    meta = {
+        "url": url,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+        "headers": {
+            k: v for k, v in resp.headers.items() if k.lower() not in SKIP_HEADERS
+        },
+    }
+    state.atomic_write(body_path, resp.content)
+    state.atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+
+
+def _discard(url):
+    for path in _entry_paths(url):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _cached_response(request, meta, body, adapter):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp.reason = "OK"
+    resp.headers = CaseInsensitiveDict(meta["headers"])
+    resp.encoding = get_encoding_from_headers(resp.headers)
+    resp._content = body
+    resp.url = request.url
+    resp.request = request
+    resp.connection = adapter
+    resp.from_cache = True
+    return resp
+
+
+class CachingAdapter(http_client.ResilientAdapter):
+    """Adapter that revalidates cached GET responses with the origin, on top
+    of http_client's retries, rate limiting and circuit breaker."""
+
+    def send(self, request, stream=False, **kwargs):
+        # Streamed bodies are read partially by the caller, so they can't be stored
+        if not ENABLED or request.method != "GET" or stream:
+            return super().send(request, stream=stream, **kwargs)
+
+        url = request.url
+        cached = _load(url)
+        if cached:
+            meta = cached[0]
+            if meta.get("etag"):
+                request.headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request.headers["If-Modified-Since"] = meta["last_modified"]
+
+        resp = super().send(request, stream=stream, **kwargs)
+        if resp.status_code == 304 and cached:
+            resp.close()
+            try:
+                # Bump the body's mtime so eviction treats the entry as recently used
+                os.utime(_entry_paths(url)[1])
+            except FileNotFoundError:
+                # Pruned since it was loaded: treat it as a miss and fetch in full
+                _discard(url)
+                cached = None
+                request.headers.pop("If-None-Match", None)
+                request.headers.pop("If-Modified-Since", None)
+                resp = super().send(request, stream=stream, **kwargs)
+            else:
+                return _cached_response(request, *cached, self)
+
+        resp.from_cache = False
+        if resp.status_code == 200:
+            if resp.headers.get("ETag") or resp.headers.get("Last-Modified"):
+                _store(url, resp)
+            elif cached:
+                _discard(url)
+        return resp
+
+
+def install(session, **adapter_kwargs):
+    """Mount the caching adapter on ``session`` for http and https URLs."""
+    adapter = CachingAdapter(**adapter_kwargs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def prune():
+    """Evict entries unused for longer than MAX_AGE, then the least recently
+    used ones until the cache fits in MAX_BYTES."""
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    now = time.time()
+    entries = []
+    for name in names:
+        if not name.endswith(".body"):
+            continue
+        body_path = os.path.join(CACHE_DIR, name)
+        meta_path = body_path[: -len(".body")] + ".json"
+        try:
+            st = os.stat(body_path)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, body_path, meta_path))
+
+    entries.sort()
+    total = sum(size for _, size, _, _ in entries)
+    for mtime, size, body_path, meta_path in entries:
+        if now - mtime <= MAX_AGE and total <= MAX_BYTES:
+            break
+        for path in (meta_path, body_path):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        total -= size
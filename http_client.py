@@ -0,0 +1,171 @@
+"""Retries, per-host rate limiting and a circuit breaker for all outbound HTTP.
+
+ResilientAdapter is the transport adapter every generator session goes
+through; http_cache's CachingAdapter builds on it. For each request it:
+
+- refuses to call a host whose circuit is open. After BREAKER_FAILURES
+  failed attempts in a row, a host is not called again for the rest of the
+  run. This stops a dead host from costing a full timeout for every article.
+- waits for a token from that host's bucket: RATE requests per second on
+  average, with bursts of up to BURST.
+- retries idempotent requests that fail with a connection error or a
+  429/5xx status, up to RETRIES times. Backoff is exponential with full
+  jitter, and honours a short Retry-After. A non-streamed body is read here,
+  so a connection dropped partway through it is retried as well. Timeouts
+  are not retried, since each one has already cost the caller's full
+  timeout. Connection errors, timeouts and 5xx replies count towards the
+  breaker; a 429 does not.
+
+Retries, breaker trips and rejected calls are counted in the run metrics.
+"""
+
+import os
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ReadTimeoutError
+
+import metrics
+
+RETRIES = int(os.environ.get("HTTP_RETRIES", "3"))
+BACKOFF = 0.5
+MAX_BACKOFF = 8.0
+RATE = float(os.environ.get("HTTP_RATE", "4"))
+BURST = max(1, int(os.environ.get("HTTP_BURST", "8")))
+BREAKER_FAILURES = int(os.environ.get("HTTP_BREAKER_FAILURES", "5"))
+
+IDEMPOTENT = {"GET", "HEAD", "OPTIONS"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Raised instead of calling a host whose circuit breaker has tripped."""
+
+
+class TokenBucket:
+    """Allow ``rate`` acquisitions per second on average, ``burst`` at once."""
+
+    def __init__(self, rate=RATE, burst=BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Take the token now, even if that goes negative, and sleep off the debt,
+            # so waiting callers are served in order
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Open after ``threshold`` consecutive failed attempts and stay open."""
+
+    def __init__(self, threshold=BREAKER_FAILURES):
+        self.threshold = threshold
+        self.failures = 0
+        self.open = False
+        self.lock = threading.Lock()
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+
+    def failure(self):
+        """Record a failed attempt; returns True if this one tripped the breaker."""
+        with self.lock:
+            self.failures += 1
+            if not self.open and self.threshold > 0 and self.failures >= self.threshold:
+                self.open = True
+                return True
+            return False
+
+
+_hosts_lock = threading.Lock()
+_buckets = {}
+_breakers = {}
+
+
+def host_state(host):
+    """Return the (TokenBucket, CircuitBreaker) shared by every session for ``host``."""
+    with _hosts_lock:
+        if host not in _buckets:
+            _buckets[host] = TokenBucket()
+            _breakers[host] = CircuitBreaker()
+        return _buckets[host], _breakers[host]
+
+
+def timed_out(exc):
+    """Whether ``exc`` is a timeout, including one while reading the body,
+    which requests reports as a ConnectionError."""
+    return isinstance(exc, requests.Timeout) or bool(exc.args and isinstance(exc.args[0], ReadTimeoutError))
+
+
+def backoff(attempt, resp=None):
+    """Seconds to wait before retry number ``attempt`` (1-based)."""
+    delay = random.uniform(0, min(MAX_BACKOFF, BACKOFF * 2 ** (attempt - 1)))
+    retry_after = resp.headers.get("Retry-After", "") if resp is not None else ""
+    if retry_after.isdigit():
+        delay = max(delay, min(MAX_BACKOFF, float(retry_after)))
+    return delay
+
+
+class ResilientAdapter(HTTPAdapter):
+    def send(self, request, **kwargs):
+        host = urlsplit(request.url).netloc
+        bucket, breaker = host_state(host)
+        retries = RETRIES if request.method in IDEMPOTENT else 0
+        attempt = 0
+        while True:
+            if breaker.open:
+                metrics.count(host, "rejected")
+                raise CircuitOpenError(f"circuit open for {host}", request=request)
+            bucket.acquire()
+            try:
+                resp = super().send(request, **kwargs)
+                if not kwargs.get("stream"):
+                    # Read the body inside the retry loop
+                    resp.content
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as e:
+                self._failed(host, breaker)
+                if attempt >= retries or timed_out(e):
+                    raise
+                resp = None
+            else:
+                if resp.status_code >= 500:
+                    self._failed(host, breaker)
+                elif resp.status_code != 429:
+                    breaker.success()
+                if resp.status_code not in RETRY_STATUSES or attempt >= retries:
+                    resp.retries = attempt
+                    return resp
+                resp.close()
+            attempt += 1
+            metrics.count(host, "retries")
+            time.sleep(backoff(attempt, resp))
+
+    def _failed(self, host, breaker):
+        if breaker.failure():
+            metrics.count(host, "breaker_trips")
+            print(f"  Circuit breaker tripped for {host}; skipping it for the rest of the run")
+
+
+def install(session, **adapter_kwargs):
+    """Mount a ResilientAdapter on ``session`` for http and https URLs."""
+    adapter = ResilientAdapter(**adapter_kwargs)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -0,0 +1,138 @@
+"""Real size and type for the thumbnail enclosures in every feed.
+
+Feeds used to write ``length="0"`` and, for the scraped sources, a fixed
+``image/jpeg`` type. Before a feed is rendered its image URLs are probed
+concurrently with HEAD requests, falling back to a one-byte ranged GET when
+the server doesn't report a length for HEAD. Image URLs don't change once
+published, so results are cached for good (least recently used entries are
+dropped beyond MAX_ENTRIES). Failed probes are retried after RETRY_AFTER.
+A warm run only probes images it hasn't seen before. Probes run CONCURRENCY
+at a time and, like every request, go through http_client's per-host token
+bucket, retries and circuit breaker.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import budget
+import http_client
+import metrics
+import state
+
+ENABLED = os.environ.get("IMAGE_PROBE", "1") != "0"
+CONCURRENCY = max(1, int(os.environ.get("IMAGE_PROBE_CONCURRENCY", "8")))
+MAX_ENTRIES = int(os.environ.get("IMAGE_PROBE_CACHE_SIZE", "5000"))
+RETRY_AFTER = 86400
+STATE_NAME = "image_meta.json"
+CONTENT_RANGE_RE = re.compile(r"bytes \d+-\d+/(\d+)")
+
+SESSION = requests.Session()
+SESSION.headers.update({"User-Agent": "IndieFeeds/1.0"})
+http_client.install(SESSION, pool_maxsize=CONCURRENCY)
+metrics.instrument(SESSION, "images")
+
+
+def _image_type(resp):
+    content_type = resp.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    return content_type if content_type.startswith("image/") else None
+
+
+def probe_url(url):
+    """Return {"length": int or None, "type": str or None} for ``url``."""
+    resp = SESSION.head(url, allow_redirects=True, timeout=15)
+    length = resp.headers.get("Content-Length")
+    if resp.ok and length and length.isdigit():
+        return {"length": int(length), "type": _image_type(resp)}
+
+    resp = SESSION.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=15)
+    with resp:
+        resp.raise_for_status()
+        if resp.status_code == 206:
+            match = CONTENT_RANGE_RE.match(resp.headers.get("Content-Range", ""))
+            length = match.group(1) if match else None
+        else:
+            # Range ignored: the full body was offered, so its length is the size
+            length = resp.headers.get("Content-Length")
+        return {
+            "length": int(length) if length and length.isdigit() else None,
+            "type": _image_type(resp),
+        }
+
+
+class ImageProbe:
+    def __init__(self, name=STATE_NAME, max_entries=MAX_ENTRIES):
+        self.name = name
+        self.max_entries = max_entries
+        self.entries = None
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if self.entries is None:
+            self.entries = OrderedDict(state.load_json(self.name, {}))
+        return self.entries
+
+    def _known(self, url, now):
+        entry = self.entries.get(url)
+        if entry is None:
+            return False
+        return entry["length"] is not None or now - entry["checked"] < RETRY_AFTER
+
+    def probe(self, urls, source=None, workers=CONCURRENCY):
+        """Probe the URLs in ``urls`` that aren't cached yet. Returns the
+        number of URLs probed. Nothing is probed once the run is out of time
+        or ``source`` has been cancelled; unknown images then get the fallback
+        enclosure."""
+        if not ENABLED or budget.expired(source=source):
+            return 0
+        now = time.time()
+        with self.lock:
+            self._load()
+            todo = sorted({url for url in urls if url and not self._known(url, now)})
+        if not todo:
+            return 0
+
+        def probe_one(url):
+            if budget.expired(source=source):
+                return url, None
+            try:
+                return url, probe_url(url)
+            except requests.RequestException as e:
+                print(f"    Image probe failed for {url}: {e}")
+                return url, {"length": None, "type": None}
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(probe_one, todo))
+        with self.lock:
+            for url, info in results:
+                if info is None:
+                    continue
+                info["checked"] = now
+                self.entries[url] = info
+        return len(todo)
+
+    def describe(self, url, default_type):
+        """Return (length, type) for an enclosure of ``url``, falling back to
+        0 and ``default_type`` for anything not known."""
+        with self.lock:
+            entry = self._load().get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+        if not entry:
+            return 0, default_type
+        return entry["length"] or 0, entry["type"] or default_type
+
+    def save(self):
+        with self.lock:
+            if self.entries is not None:
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+                state.save_json(self.name, self.entries)
+
+
+PROBE = ImageProbe()
@@ -0,0 +1,62 @@
+"""Rolling window of the items each scraped feed has published.
+
+Scroll, Caravan and EPW only see what their homepage lists right now. Each
+run's items are merged by GUID into a store kept in the cache directory, and
+the feed is written from the store. An item that drops off the homepage stays
+in the feed until WINDOW newer items push it out or it hasn't been seen for
+MAX_AGE. When a homepage can't be fetched, the feed is written from the
+stored items instead of being dropped.
+"""
+
+import os
+import time
+
+import state
+
+WINDOW = int(os.environ.get("FEED_WINDOW_ITEMS", "50"))
+MAX_AGE = float(os.environ.get("FEED_WINDOW_DAYS", "30")) * 86400
+
+
+class ItemStore:
+    """Items of one feed, keyed by ``guid(item)`` and ordered newest first
+    by ``date(item)``. Items with the same date keep the order of the latest
+    merge, i.e. page order. Items must be JSON-serializable."""
+
+    def __init__(self, name, guid, date, window=WINDOW, max_age=MAX_AGE):
+        self.name = name
+        self.guid = guid
+        self.date = date
+        self.window = window
+        self.max_age = max_age
+        self.entries = state.load_json(name, {})
+
+    def merge(self, items):
+        """Add or refresh ``items`` and return the feed's items, newest first.
+        A newly scraped item replaces the stored one with the same GUID."""
+        now = time.time()
+        fresh = {self.guid(item): {"item": item, "seen": now} for item in items}
+        # This run's items go first, in the order given, so sorting (which is
+        # stable) breaks date ties by page order
+        self.entries = {**fresh, **{guid: e for guid, e in self.entries.items() if guid not in fresh}}
+        self._trim(now, max(self.window, len(items)))
+        return self.items()
+
+    def items(self):
+        return [entry["item"] for entry in self._ordered()]
+
+    def _ordered(self):
+        # Newest first; among equal dates, the most recently seen first
+        return sorted(
+            self.entries.values(),
+            key=lambda entry: (self.date(entry["item"]), entry["seen"]),
+            reverse=True,
+        )
+
+    def _trim(self, now, window):
+        kept = [entry for entry in self.entries.values() if now - entry["seen"] <= self.max_age]
+        # This run's items go first, so only previously seen ones fall out
+        kept.sort(key=lambda entry: (entry["seen"] == now, self.date(entry["item"])), reverse=True)
+        self.entries = {self.guid(entry["item"]): entry for entry in kept[:window]}
+
+    def save(self):
+        state.save_json(self.name, self.entries)
@@ -0,0 +1,193 @@
+"""Per-run instrumentation for the generators.
+
+Every HTTP call made through an instrumented session is recorded with its
+URL, status, latency, bytes transferred and whether it was answered from
+the HTTP cache. A cache hit transfers no body; its size is recorded as
+``cached_bytes`` instead, so the report shows what the cache saves. Named stages (fetch, parse, render, write) are timed per source.
+At the end of a run ``write_report`` saves everything as JSON next to the
+feeds and prints the slowest requests and stages.
+
+Stages can nest: the write stage includes rendering, since items are
+rendered while the feed is streamed to disk, and parse time spent in worker
+threads is summed across threads.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+REPORT_NAME = "run_metrics.json"
+TOP_N = int(os.environ.get("METRICS_TOP_N", "10"))
+
+_lock = threading.Lock()
+_requests = []
+_stages = {}
+_events = {}
+
+
+def instrument(session, source):
+    """Record every request sent through ``session`` under ``source``."""
+    send = session.send
+
+    def timed_send(request, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = send(request, **kwargs)
+        except Exception as e:
+            record_request(source, request, None, time.perf_counter() - start, error=e)
+            raise
+        # Non-streamed bodies have been read by now, so this covers the download.
+        # Readers of streamed bodies can update the entry with what they read.
+        resp.metrics_entry = record_request(
+            source, request, resp, time.perf_counter() - start, kwargs.get("stream")
+        )
+        return resp
+
+    session.send = timed_send
+    return session
+
+
+def record_request(source, request, resp, seconds, stream=False, error=None):
+    entry = {
+        "source": source,
+        "method": request.method,
+        "url": request.url,
+        "status": None,
+        "seconds": round(seconds, 4),
+        "bytes": None,
+        "cached_bytes": 0,
+        "from_cache": False,
+    }
+    if resp is not None:
+        entry["status"] = resp.status_code
+        entry["retries"] = getattr(resp, "retries", 0)
+        entry["from_cache"] = getattr(resp, "from_cache", False)
+        if stream:
+            length = resp.headers.get("Content-Length")
+            entry["bytes"] = int(length) if length and length.isdigit() else None
+        elif entry["from_cache"]:
+            entry["bytes"] = 0
+            entry["cached_bytes"] = len(resp.content)
+        else:
+            entry["bytes"] = len(resp.content)
+    if error is not None:
+        entry["error"] = type(error).__name__
+    with _lock:
+        _requests.append(entry)
+    return entry
+
+
+def count(host, event):
+    """Count an HTTP layer event (a retry, a breaker trip, ...) for ``host``."""
+    with _lock:
+        events = _events.setdefault(host, {})
+        events[event] = events.get(event, 0) + 1
+
+
+def _add_stage(source, name, seconds):
+    with _lock:
+        stats = _stages.setdefault((source, name), {"count": 0, "seconds": 0.0, "max": 0.0})
+        stats["count"] += 1
+        stats["seconds"] += seconds
+        stats["max"] = max(stats["max"], seconds)
+
+
+@contextmanager
+def stage(source, name):
+    """Time the enclosed block as one occurrence of stage ``name``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_stage(source, name, time.perf_counter() - start)
+
+
+def timed(source, name, items):
+    """Yield from ``items``, timing each step as one occurrence of stage ``name``."""
+    items = iter(items)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(items)
+        except StopIteration:
+            return
+        _add_stage(source, name, time.perf_counter() - start)
+        yield item
+
+
+def _source_summary():
+    summary = {}
+    for entry in _requests:
+        stats = summary.setdefault(
+            entry["source"],
+            {
+                "requests": 0,
+                "cache_hits": 0,
+                "errors": 0,
+                "bytes": 0,
+                "cached_bytes": 0,
+                "request_seconds": 0.0,
+            },
+        )
+        stats["requests"] += 1
+        stats["cache_hits"] += entry["from_cache"]
+        stats["errors"] += entry["status"] is None or entry["status"] >= 400
+        stats["bytes"] += entry["bytes"] or 0
+        stats["cached_bytes"] += entry["cached_bytes"]
+        stats["request_seconds"] = round(stats["request_seconds"] + entry["seconds"], 4)
+    return summary
+
+
+def build_report(runs=None):
+    """Return the collected metrics as a JSON-serialisable dict. ``runs`` maps
+    source names to extra per-source details, such as status and wall time."""
+    with _lock:
+        stages = [
+            {
+                "source": source,
+                "stage": name,
+                "count": stats["count"],
+                "seconds": round(stats["seconds"], 4),
+                "max": round(stats["max"], 4),
+            }
+            for (source, name), stats in _stages.items()
+        ]
+        return {
+            "generated": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "runs": runs or {},
+            "sources": _source_summary(),
+            "stages": stages,
+            "hosts": {host: dict(events) for host, events in _events.items()},
+            "requests": list(_requests),
+        }
+
+
+def print_slowest(report, top=TOP_N):
+    slow = sorted(report["requests"], key=lambda r: r["seconds"], reverse=True)[:top]
+    if slow:
+        print(f"\nSlowest {len(slow)} requests:")
+        for r in slow:
+            status = r["status"] or r.get("error", "error")
+            cached = " (cached)" if r["from_cache"] else ""
+            print(f"  {r['seconds']:7.2f}s  {r['source']:<8} {status}  {r['url']}{cached}")
+    stages = sorted(report["stages"], key=lambda s: s["seconds"], reverse=True)[:top]
+    if stages:
+        print(f"\nSlowest {len(stages)} stages:")
+        for s in stages:
+            print(f"  {s['seconds']:7.2f}s  {s['source']:<8} {s['stage']:<14} x{s['count']}")
+    if report["hosts"]:
+        print("\nHTTP events:")
+        for host, events in sorted(report["hosts"].items()):
+            print(f"  {host}: " + ", ".join(f"{n} {event}" for event, n in sorted(events.items())))
+
+
+def write_report(out_dir, runs=None, top=TOP_N):
+    """Save the report to ``out_dir`` and print the slowest requests and stages."""
+    report = build_report(runs)
+    os.makedirs(out_dir, exist_ok=True)
+    with open(os.path.join(out_dir, REPORT_NAME), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print_slowest(report, top)
+    return report
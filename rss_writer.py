@@ -0,0 +1,150 @@
+"""Streaming RSS 2.0 writer shared by all generators.
+
+Feeds are produced as a sequence of chunks (channel header, one chunk per
+rendered item, footer) so they can be written straight to disk without
+holding the whole document in memory.
+
+write_feed fingerprints everything except lastBuildDate and records it in a
+manifest kept between runs. A feed whose content hasn't changed keeps its
+previous lastBuildDate and is not rewritten, so readers and CDNs see an
+identical file.
+"""
+
+import datetime
+import hashlib
+import os
+import re
+import shutil
+import threading
+
+import state
+
+MANIFEST_NAME = "feed_manifest.json"
+LAST_BUILD_RE = re.compile(r"<lastBuildDate>(.*?)</lastBuildDate>")
+GUID_RE = re.compile(r"<guid[^>]*>(.*?)</guid>")
+TMP_SUFFIX = ".tmp"
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def escape_xml(text):
+    return (
+        text.replace("&", "&amp;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+        .replace('"', "&quot;")
+        .replace("'", "&apos;")
+    )
+
+
+def build_date():
+    return datetime.datetime.now(datetime.timezone.utc).strftime(
+        "%a, %d %b %Y %H:%M:%S +0000"
+    )
+
+
+def iter_feed(title, link, description, feed_url, items, last_build_date=None):
+    """Yield the feed as chunks; ``items`` is an iterable of rendered <item> strings."""
+    yield f"""<?xml version="1.0" encoding="UTF-8"?>
+<rss version="2.0"
+  xmlns:content="http://purl.org/rss/1.0/modules/content/"
+  xmlns:dc="http://purl.org/dc/elements/1.1/"
+  xmlns:atom="http://www.w3.org/2005/Atom"
+  xmlns:media="http://search.yahoo.com/mrss/">
+  <channel>
+    <title>{escape_xml(title)}</title>
+    <link>{escape_xml(link)}</link>
+    <description>{escape_xml(description)}</description>
+    <language>en</language>
+    <lastBuildDate>{last_build_date or build_date()}</lastBuildDate>
+    <atom:link href="{escape_xml(feed_url)}" rel="self" type="application/rss+xml"/>
+"""
+    for i, item in enumerate(items):
+        if i:
+            yield "\n"
+        yield item
+    yield """
+  </channel>
+</rss>"""
+
+
+def feed_guids(path):
+    """Return the item GUIDs of the feed at ``path``, or [] if it is missing."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return GUID_RE.findall(f.read())
+    except OSError:
+        return []
+
+
+def _load_manifest():
+    global _manifest
+    if _manifest is None:
+        _manifest = state.load_json(MANIFEST_NAME, {})
+    return _manifest
+
+
+def save_manifest():
+    with _manifest_lock:
+        if _manifest is not None:
+            state.save_json(MANIFEST_NAME, _manifest)
+
+
+def remove_temp_files(out_dir):
+    """Delete feed temp files left in ``out_dir`` by a writer that was killed
+    mid-write, so they are neither cached nor deployed."""
+    for name in os.listdir(out_dir):
+        if name.endswith(TMP_SUFFIX):
+            try:
+                os.unlink(os.path.join(out_dir, name))
+            except FileNotFoundError:
+                pass
+
+
+def write_feed(path, chunks):
+    """Write the chunks from iter_feed to ``path`` unless the feed is unchanged.
+
+    Chunks are streamed to a temp file while being hashed. Returns True if
+    ``path`` was (re)written and False if it already held the same feed.
+    """
+    chunks = iter(chunks)
+    header = next(chunks)
+    digest = hashlib.sha256(LAST_BUILD_RE.sub("", header).encode("utf-8"))
+    tmp_path = path + TMP_SUFFIX
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(header)
+            for chunk in chunks:
+                f.write(chunk)
+                digest.update(chunk.encode("utf-8"))
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    fingerprint = digest.hexdigest()
+
+    name = os.path.basename(path)
+    with _manifest_lock:
+        previous = _load_manifest().get(name)
+    if previous and previous["hash"] == fingerprint:
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+            return False
+        # Same items but no file on disk: restore it with the original build date
+        old_header = LAST_BUILD_RE.sub(
+            f"<lastBuildDate>{previous['last_build_date']}</lastBuildDate>", header
+        )
+        with open(tmp_path, encoding="utf-8") as src, open(path, "w", encoding="utf-8") as dst:
+            src.read(len(header))
+            dst.write(old_header)
+            shutil.copyfileobj(src, dst)
+        os.unlink(tmp_path)
+        return True
+
+    os.replace(tmp_path, path)
+    with _manifest_lock:
+        _load_manifest()[name] = {
+            "hash": fingerprint,
+            "last_build_date": LAST_BUILD_RE.search(header).group(1),
+        }
+    return True
@@ -0,0 +1,93 @@
+"""Adaptive refresh schedule for sources and Wire categories.
+
+Each schedule key (a source such as ``epw``, or a Wire category such as
+``wire:politics``) keeps the GUIDs it has seen and the times new ones turned
+up. The next refresh comes after half the average gap between arrivals over
+the last HISTORY seconds, clamped to [MIN_INTERVAL, MAX_INTERVAL]. A key
+with no arrivals waits as long as it has been quiet, within the same bounds.
+This way a weekly journal is checked a few times a day, while a busy source
+is refreshed on every run.
+"""
+
+import os
+import threading
+import time
+
+import state
+
+ENABLED = os.environ.get("SCHEDULE", "1") != "0"
+MIN_INTERVAL = float(os.environ.get("SCHEDULE_MIN_MINUTES", "30")) * 60
+MAX_INTERVAL = float(os.environ.get("SCHEDULE_MAX_HOURS", "12")) * 3600
+HISTORY = 7 * 86400
+# Cron start times drift, so anything due within this margin is refreshed now
+# rather than a whole cron interval later
+EARLY = 5 * 60
+MAX_SEEN = 300
+STATE_NAME = "schedule.json"
+
+
+class Scheduler:
+    def __init__(self, name=STATE_NAME, min_interval=MIN_INTERVAL, max_interval=MAX_INTERVAL):
+        self.name = name
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.entries = None
+        self.lock = threading.Lock()
+
+    def _load(self):
+        if self.entries is None:
+            self.entries = state.load_json(self.name, {})
+        return self.entries
+
+    def due(self, key, now=None):
+        """Whether ``key`` should be refreshed in this run."""
+        if not ENABLED:
+            return True
+        now = time.time() if now is None else now
+        with self.lock:
+            entry = self._load().get(key)
+        return entry is None or now + EARLY >= entry["next"]
+
+    def interval(self, entry, now):
+        arrivals = [t for t in entry["arrivals"] if now - t <= HISTORY]
+        span = min(HISTORY, now - entry["first_seen"])
+        if arrivals:
+            interval = span / len(arrivals) / 2
+        else:
+            interval = span
+        return min(self.max_interval, max(self.min_interval, interval))
+
+    def record(self, key, guids, result=None, now=None):
+        """Record a successful refresh of ``key`` that produced ``guids``.
+        ``result`` is kept for callers that skip the refresh later."""
+        now = time.time() if now is None else now
+        with self.lock:
+            entries = self._load()
+            entry = entries.get(key)
+            if entry is None:
+                # The first refresh is a baseline; none of its items are new
+                entry = {"first_seen": now, "seen": list(guids), "arrivals": []}
+            else:
+                seen = set(entry["seen"])
+                new = [guid for guid in guids if guid not in seen]
+                entry["arrivals"] = [t for t in entry["arrivals"] if now - t <= HISTORY]
+                entry["arrivals"] += [now] * len(new)
+                entry["seen"] = (new + entry["seen"])[:MAX_SEEN]
+            entry["last_run"] = now
+            entry["next"] = now + self.interval(entry, now)
+            if result is not None:
+                entry["result"] = result
+            entries[key] = entry
+
+    def result(self, key):
+        with self.lock:
+            entry = self._load().get(key)
+        return entry.get("result") if entry else None
+
+    def save(self):
+        with self.lock:
+            if self.entries is not None:
+                state.save_json(self.name, self.entries)
+
+
+SCHEDULE = Scheduler()
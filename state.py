@@ -0,0 +1,39 @@
+"""Small helpers for state that persists between runs (caches, stores)."""
+
+import json
+import os
+import tempfile
+
+CACHE_DIR = os.environ.get(
+    "CACHE_DIR", os.path.join(os.path.dirname(__file__), ".cache")
+)
+
+
+def cache_path(*parts):
+    return os.path.join(CACHE_DIR, *parts)
+
+
+def load_json(name, default):
+    """Load a JSON file from the cache directory, or return ``default``."""
+    try:
+        with open(cache_path(name), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def atomic_write(path, data):
+    """Write bytes to ``path`` via a temp file so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def save_json(name, data):
+    atomic_write(cache_path(name), json.dumps(data, separators=(",", ":")).encode("utf-8"))
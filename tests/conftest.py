@@ -0,0 +1,16 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import state  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    """Keep every test's persistent state in its own temp directory."""
+    path = str(tmp_path / "cache")
+    monkeypatch.setattr(state, "CACHE_DIR", path)
+    return path
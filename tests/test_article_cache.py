@@ -0,0 +1,42 @@
+import pytest
+
+import article_cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(article_cache.time, "time", lambda: now[0])
+    return now
+
+
+def make_cache(**kwargs):
+    return article_cache.ArticleCache("articles.json", ttl=7200, miss_ttl=600, **kwargs)
+
+
+def test_metadata_is_reused_until_the_ttl(clock):
+    cache = make_cache()
+    cache.put("/a", {"title": "A"})
+    clock[0] += 7200
+    assert cache.get("/a") == {"title": "A"}
+    clock[0] += 1
+    assert cache.get("/a") is article_cache.MISSING
+
+
+def test_pages_without_metadata_expire_after_the_miss_ttl(clock):
+    cache = make_cache()
+    cache.put("/challenge", None)
+    assert cache.get("/challenge") is None
+    clock[0] += 601
+    assert cache.get("/challenge") is article_cache.MISSING
+
+
+def test_save_drops_expired_and_keeps_the_newest(clock):
+    cache = make_cache(max_entries=2)
+    cache.put("/miss", None)
+    for path in ("/a", "/b", "/c"):
+        clock[0] += 1
+        cache.put(path, {"title": path})
+    clock[0] += 600
+    cache.save()
+    assert sorted(make_cache().entries) == ["/b", "/c"]
@@ -0,0 +1,61 @@
+import math
+
+import pytest
+
+import budget
+import throttle
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(budget.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(budget, "_start", 100.0)
+    monkeypatch.setattr(budget, "_cancelled", set())
+    return now
+
+
+def test_no_budget_never_expires(clock, monkeypatch):
+    monkeypatch.setattr(budget, "BUDGET", 0)
+    clock[0] += 10**6
+    assert budget.remaining() == math.inf
+    assert not budget.expired(budget.CATEGORY_MARGIN)
+
+
+def test_reserve_is_kept_back(clock, monkeypatch):
+    monkeypatch.setattr(budget, "BUDGET", 600)
+    monkeypatch.setattr(budget, "RESERVE", 60)
+    assert budget.remaining() == 540
+    clock[0] += 540
+    assert budget.expired()
+
+
+def test_margin_stops_work_early(clock, monkeypatch):
+    monkeypatch.setattr(budget, "BUDGET", 600)
+    monkeypatch.setattr(budget, "RESERVE", 60)
+    clock[0] += 450
+    # 90 seconds left: categories (120s margin) stop, article pages don't
+    assert budget.expired(120)
+    assert not budget.expired()
+
+
+def test_cancel_only_stops_that_source(clock, monkeypatch):
+    monkeypatch.setattr(budget, "BUDGET", 0)
+    budget.cancel("caravan")
+    assert budget.expired(source="caravan")
+    assert not budget.expired(source="epw")
+    assert not budget.expired()
+
+
+def test_host_slot_refuses_work_once_the_budget_is_gone(clock, monkeypatch):
+    monkeypatch.setattr(budget, "BUDGET", 0)
+    limiter = throttle.HostLimiter(max_per_host=1)
+    with limiter.slot("https://example.com/a", "epw"):
+        pass
+    budget.cancel("epw")
+    with pytest.raises(budget.BudgetExceeded):
+        with limiter.slot("https://example.com/a", "epw"):
+            pass
+    # The host's only slot was released again
+    with limiter.slot("https://example.com/a"):
+        pass
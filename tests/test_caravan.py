@@ -0,0 +1,30 @@
+import pytest
+
+from generate_caravan_feed import extract_article_urls
+
+PAGE = """<html><body>
+<a href="/politics"><h1>Politics</h1></a>
+<div class="card"><a href="/politics/first-story"><h2>First &amp; foremost</h2></a></div>
+<div class="card">
+  <a href="/reportage/second-story"><img src="x.jpg"></a>
+  <span>by <a href="/author/someone">Someone</a></span>
+  <h3>Second story</h3>
+</div>
+<div class="card"><a href="/magazine/2024/1"><h2>Issue</h2></a></div>
+<a href="/pages/about"><h5>About</h5></a>
+<div class="card"><a href="https://example.com/elsewhere"><h2>External</h2></a></div>
+<div class="card"><a href="/politics/first-story"><h4>First again</h4></a></div>
+<a href="/culture/no-heading">Read more</a>
+</body></html>"""
+
+EXPECTED = ["/politics/first-story", "/reportage/second-story"]
+
+
+def test_links_pair_with_the_next_heading():
+    assert extract_article_urls([PAGE]) == EXPECTED
+
+
+@pytest.mark.parametrize("size", [1, 7, 64])
+def test_chunked_page_gives_the_same_links(size):
+    chunks = [PAGE[i : i + size] for i in range(0, len(PAGE), size)]
+    assert extract_article_urls(chunks) == EXPECTED
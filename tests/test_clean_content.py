@@ -0,0 +1,26 @@
+import pytest
+
+from generate_feed import clean_content
+
+
+@pytest.mark.parametrize(
+    "html, expected",
+    [
+        # Newlines on both sides of a removed block collapse together
+        ("a\n\n<script>ads.push(1);\n</script>\n\n\nb", "a\n\nb"),
+        ("a\n\n\n\nb", "a\n\nb"),
+        (
+            '<img src="a.jpg" loading="lazy" decoding="async" data-id="1"\n'
+            ' srcset="a-300.jpg 300w" sizes="100vw"/>',
+            '<img src="a.jpg"/>',
+        ),
+        ('<noscript><img src="a.jpg"/></noscript><p>text</p>', "<p>text</p>"),
+        ('<noscript><script>x()</script></noscript> data-x="1">', ">"),
+        ('<style>p {}</style>\n<div data-align="wide">HTML</div>', '<div>HTML</div>'),
+        # Only attributes are stripped, not text that looks like them
+        ("<p>data-x is fine</p>", "<p>data-x is fine</p>"),
+        ("  <p>text</p>\n", "<p>text</p>"),
+    ],
+)
+def test_clean_content(html, expected):
+    assert clean_content(html) == expected
@@ -0,0 +1,42 @@
+import gzip
+import os
+
+import compress
+
+GZIP = [(".gz", compress._gzip)]
+
+
+def write(path, data, mtime_ns):
+    with open(path, "wb") as f:
+        f.write(data)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_copy_is_only_rebuilt_when_the_mtime_changes(tmp_path):
+    path = str(tmp_path / "feed.xml")
+    write(path, b"<rss>one</rss>", 10**18)
+    assert compress.compress_file(path, GZIP) == 1
+    assert os.stat(path + ".gz").st_mtime_ns == 10**18
+
+    # Same mtime: skipped without reading the source
+    write(path, b"<rss>two</rss>", 10**18)
+    assert compress.compress_file(path, GZIP) == 0
+    with gzip.open(path + ".gz") as f:
+        assert f.read() == b"<rss>one</rss>"
+
+    write(path, b"<rss>two</rss>", 2 * 10**18)
+    assert compress.compress_file(path, GZIP) == 1
+    with gzip.open(path + ".gz") as f:
+        assert f.read() == b"<rss>two</rss>"
+
+
+def test_compress_dir_removes_copies_of_deleted_feeds(tmp_path, monkeypatch):
+    monkeypatch.setattr(compress, "ENABLED", True)
+    monkeypatch.setattr(compress, "encoders", lambda: GZIP)
+    write(str(tmp_path / "feed.xml"), b"<rss/>", 10**18)
+    write(str(tmp_path / "gone.xml.gz"), b"", 10**18)
+    write(str(tmp_path / "notes.txt"), b"", 10**18)
+
+    assert compress.compress_dir(str(tmp_path)) == 1
+    assert sorted(os.listdir(tmp_path)) == ["feed.xml", "feed.xml.gz", "notes.txt"]
+
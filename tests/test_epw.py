@@ -0,0 +1,30 @@
+from generate_epw_feed import meta_index
+
+
+def test_content_may_come_before_or_after_the_key():
+    page = """
+    <meta property="og:title" content="Title">
+    <meta content='Summary' name="description">
+    <META CONTENT="Author" NAME="author">
+    """
+    assert meta_index(page) == {"og:title": "Title", "description": "Summary", "author": "Author"}
+
+
+def test_first_tag_wins_and_property_beats_name():
+    page = """
+    <meta name="og:image" content="from-name.jpg">
+    <meta property="og:image" content="first.jpg">
+    <meta property="og:image" content="second.jpg">
+    <meta name="description" content="first">
+    <meta name="description" content="second">
+    """
+    assert meta_index(page) == {"og:image": "first.jpg", "description": "first"}
+
+
+def test_quoted_brackets_and_tags_without_content():
+    page = """
+    <meta charset="utf-8">
+    <meta name="viewport">
+    <meta property="og:title" content="a > b">
+    """
+    assert meta_index(page) == {"og:title": "a > b"}
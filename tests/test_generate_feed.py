@@ -0,0 +1,208 @@
+import generate_feed
+
+
+def make_post(post_id, date="2024-01-01T10:00:00", modified=None, categories=()):
+    return {
+        "id": post_id,
+        "date": date,
+        "modified": modified or date,
+        "link": f"https://thewire.in/story/{post_id}",
+        "guid": {"rendered": f"https://cms.thewire.in/?p={post_id}"},
+        "title": {"rendered": f"Story {post_id}"},
+        "excerpt": {"rendered": "<p>Excerpt</p>"},
+        "content": {"rendered": "<p>Body</p>"},
+        "_embedded": {
+            "wp:term": [[{"id": cat, "taxonomy": "category", "name": f"Cat {cat}"} for cat in categories]]
+        },
+    }
+
+
+# --- ItemCache ------------------------------------------------------------------
+
+
+def test_item_cache_reuses_renders_until_the_post_changes():
+    cache = generate_feed.ItemCache()
+    first = cache.render(make_post(1))
+    assert cache.render(make_post(1)) is first
+    edited = make_post(1, modified="2024-01-02T00:00:00")
+    cache.render(edited)
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_item_cache_is_discarded_when_its_version_changes(monkeypatch):
+    cache = generate_feed.ItemCache(name="items.json")
+    cache.render(make_post(1))
+    cache.save()
+    assert len(generate_feed.ItemCache(name="items.json").items) == 1
+
+    monkeypatch.setattr(generate_feed.ItemCache, "VERSION", "other")
+    assert len(generate_feed.ItemCache(name="items.json").items) == 0
+
+
+
+# --- category_posts_from_index --------------------------------------------------
+
+
+def test_only_categories_short_of_posts_are_topped_up(monkeypatch):
+    recent = [make_post(i, categories=[1, 2] if i <= 2 else [1]) for i in range(1, 5)]
+    recent += [make_post(9, categories=[3])]
+    categories = [
+        {"id": 1, "count": 100},  # enough crawled posts
+        {"id": 2, "count": 2},  # fewer than ``count``, but all of them crawled
+        {"id": 3, "count": 10},  # short: 1 of its 10 posts crawled
+    ]
+    topped_up = []
+
+    def fetch_category_posts(cats, count):
+        topped_up.extend(cat["id"] for cat in cats)
+        return [(cat, [make_post(100 + cat["id"])], None) for cat in cats]
+
+    monkeypatch.setattr(generate_feed, "fetch_category_posts", fetch_category_posts)
+    results = generate_feed.category_posts_from_index(categories, recent, count=3)
+
+    assert topped_up == [3]
+    assert [cat["id"] for cat, _, _ in results] == [1, 2, 3]
+    assert [[p["id"] for p in posts] for _, posts, _ in results] == [[1, 2, 3], [1, 2], [103]]
+
+
+# --- sync_posts -----------------------------------------------------------------
+
+
+class FakeRecentPosts:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def __call__(self, total, filters=None):
+        self.calls.append((total, filters))
+        return self.responses.pop(0)
+
+
+def test_sync_crawls_once_then_asks_for_changes_since_the_watermark(monkeypatch):
+    first = [
+        make_post(1, date="2024-01-01T10:00:00", modified="2024-01-01T12:00:00"),
+        make_post(2, date="2024-01-01T11:00:00"),
+    ]
+    edited = make_post(1, date="2024-01-01T10:00:00", modified="2024-01-02T09:00:00")
+    scheduled = make_post(3, date="2024-01-02T08:00:00", modified="2024-01-01T09:00:00")
+    fetch = FakeRecentPosts(first, [edited], [scheduled])
+    monkeypatch.setattr(generate_feed, "fetch_recent_posts", fetch)
+    monkeypatch.setattr(generate_feed, "CRAWL_POSTS", 50)
+
+    assert [p["id"] for p in generate_feed.sync_posts(max_posts=2)] == [2, 1]
+    assert fetch.calls == [(50, None)]
+
+    posts = generate_feed.sync_posts(max_posts=2)
+    # The watermark is the newest modified time (12:00) and the newest post
+    # is from 11:00; both queries reach back SYNC_OVERLAP (5 minutes)
+    assert fetch.calls[1:] == [
+        (2, {"modified_after": "2024-01-01T11:55:00"}),
+        (2, {"after": "2024-01-01T10:55:00"}),
+    ]
+    # Newest first, the edit replaced the stored post, and the window is kept
+    assert [p["id"] for p in posts] == [3, 2]
+    store = generate_feed.state.load_json("wire_posts.json", {})
+    assert sorted(store["posts"]) == ["2", "3"]
+
+
+def test_sync_with_nothing_stored_or_fetched_saves_nothing(monkeypatch):
+    monkeypatch.setattr(generate_feed, "fetch_recent_posts", FakeRecentPosts([]))
+    assert generate_feed.sync_posts() == []
+    assert generate_feed.state.load_json("wire_posts.json", None) is None
+
+
+# --- Lookup ---------------------------------------------------------------------
+
+
+class FakeLookup(generate_feed.Lookup):
+    """Lookup whose endpoint knows ``known`` ids, or fails with ``known=None``."""
+
+    def __init__(self, known, **kwargs):
+        super().__init__("https://example.com/users", "id,name", **kwargs)
+        self.known = known
+        self.batches = []
+        self.gate = None
+
+    def _fetch(self, batch):
+        self.batches.append(batch)
+        if self.gate is not None:
+            self.gate.wait(5)
+        if self.known is None:
+            return None
+        return {int(key): {"id": int(key)} for key in batch if int(key) in self.known}
+
+
+def test_lookup_fetches_each_id_once_and_reports_missing_ones():
+    lookup = FakeLookup({1, 2})
+    assert lookup.get_many([1, 2, 3, 0, None]) == {1: {"id": 1}, 2: {"id": 2}, 3: None}
+    assert lookup.get_many([2, 3]) == {2: {"id": 2}, 3: None}
+    assert lookup.batches == [["1", "2", "3"]]
+
+
+def test_lookup_asks_for_missing_ids_again_after_their_ttl(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(generate_feed.time, "time", lambda: now[0])
+    lookup = FakeLookup({1})
+    lookup.get_many([5])
+    now[0] += generate_feed.Lookup.MISSING_TTL - 1
+    lookup.get_many([5])
+    assert lookup.batches == [["5"]]
+
+    now[0] += 1
+    lookup.known = {5}
+    assert lookup.get_many([5]) == {5: {"id": 5}}
+    assert lookup.batches == [["5"], ["5"]]
+
+
+def test_failed_lookups_are_left_out_and_retried():
+    lookup = FakeLookup(None)
+    assert lookup.get_many([1]) == {}
+    lookup.known = {1}
+    assert lookup.get_many([1]) == {1: {"id": 1}}
+    assert lookup.batches == [["1"], ["1"]]
+
+
+def test_ids_being_fetched_by_another_thread_are_waited_for():
+    lookup = FakeLookup({1, 2, 3})
+    lookup.gate = generate_feed.threading.Event()
+    results = {}
+    first = generate_feed.threading.Thread(target=lambda: results.update(a=lookup.get_many([1, 2])))
+    first.start()
+    while not lookup.batches:
+        generate_feed.time.sleep(0.001)
+    second = generate_feed.threading.Thread(target=lambda: results.update(b=lookup.get_many([2, 3])))
+    second.start()
+    while len(lookup.batches) < 2:
+        generate_feed.time.sleep(0.001)
+    # The second caller fetches only 3, then waits for the first to bring 2
+    assert lookup.batches == [["1", "2"], ["3"]]
+    lookup.gate.set()
+    first.join(5)
+    second.join(5)
+    assert results["b"] == {2: {"id": 2}, 3: {"id": 3}}
+
+
+def test_lookup_cache_is_saved_between_runs():
+    lookup = FakeLookup({1}, name="users.json")
+    lookup.get_many([1])
+    lookup.save()
+    again = FakeLookup({1}, name="users.json")
+    assert again.get_many([1]) == {1: {"id": 1}}
+    assert again.batches == []
+
+
+# --- unchanged_categories -------------------------------------------------------
+
+
+def test_unchanged_categories(monkeypatch):
+    now = 1_700_000_000.0
+    monkeypatch.setattr(generate_feed.time, "time", lambda: now)
+    saved = {
+        str(cat): {"count": 10, "newest": 5, "fetched": now - 60} for cat in (1, 2, 3, 4)
+    }
+    saved["4"]["fetched"] = now - 3601
+    categories = [{"id": cat, "count": 11 if cat == 2 else 10} for cat in (1, 2, 3, 4, 5)]
+    recent = [make_post(5, categories=[1]), make_post(6, categories=[3])]
+
+    # 2's count changed, 3 has a newer post, 4 is too old and 5 was never fetched
+    assert generate_feed.unchanged_categories(categories, saved, recent, max_age=3600) == {1}
@@ -0,0 +1,102 @@
+import pytest
+import requests
+
+import head_fetch
+
+HEAD = "<html><head><title>Café</title><meta property='og:title' content='x'></head>"
+BODY = "<body>" + "<p>paragraph</p>" * 2000 + "</body></html>"
+PAGE = (HEAD + BODY).encode("utf-8")
+
+
+class FakeResponse:
+    def __init__(self, data, chunk_size, status=200):
+        self.data = data
+        self.status_code = status
+        self.encoding = "utf-8"
+        self.chunks_read = 0
+        self.metrics_entry = {"bytes": None}
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.closed = True
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} error", response=self)
+
+    def iter_content(self, size):
+        for i in range(0, len(self.data), size):
+            self.chunks_read += 1
+            yield self.data[i : i + size]
+
+    @property
+    def text(self):
+        return self.data.decode(self.encoding)
+
+
+class FakeSession:
+    def __init__(self, resp):
+        self.resp = resp
+        self.streamed = None
+
+    def get(self, url, timeout, stream=False):
+        self.streamed = stream
+        return self.resp
+
+
+def fetch(data, done, chunk_size=64, status=200):
+    resp = FakeResponse(data, chunk_size, status)
+    text = head_fetch.fetch_text(FakeSession(resp), "https://example.com/", done, chunk_size=chunk_size)
+    return text, resp
+
+
+def test_stops_once_done_after_the_head():
+    calls = []
+
+    def done(text):
+        calls.append(len(text))
+        return "og:title" in text
+
+    text, resp = fetch(PAGE, done, chunk_size=7)
+    # Not checked before </head>, which is split across chunks at this size
+    assert len(calls) == 1
+    assert text.startswith(HEAD)
+    assert len(text) < len(HEAD) + 16
+    assert resp.metrics_entry["bytes"] == resp.chunks_read * 7
+    assert resp.closed
+
+
+def test_reads_the_whole_page_when_never_done():
+    calls = []
+
+    def done(text):
+        calls.append(len(text))
+        return False
+
+    text, resp = fetch(PAGE, done)
+    assert text == PAGE.decode("utf-8")
+    assert resp.metrics_entry["bytes"] == len(PAGE)
+    # Checks grow geometrically, so the page is rescanned a bounded number of times
+    assert len(calls) <= 15
+    assert sum(calls) < 4 * len(text)
+
+
+def test_multibyte_characters_split_across_chunks():
+    page = ("<head></head>" + "नमस्ते " * 50).encode("utf-8")
+    text, _ = fetch(page, lambda text: False, chunk_size=5)
+    assert text == page.decode("utf-8")
+
+
+def test_http_errors_raise():
+    with pytest.raises(requests.HTTPError):
+        fetch(PAGE, lambda text: True, status=404)
+
+
+def test_disabled_reads_the_page_in_one_request(monkeypatch):
+    monkeypatch.setattr(head_fetch, "ENABLED", False)
+    session = FakeSession(FakeResponse(PAGE, 64))
+    assert head_fetch.fetch_text(session, "https://example.com/", lambda text: True) == PAGE.decode("utf-8")
+    assert session.streamed is False
@@ -0,0 +1,120 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import http_cache
+
+ETAG = '"v1"'
+BODY = b"<html>cached body</html>"
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.server.seen.append(self.headers.get("If-None-Match"))
+        if self.headers.get("If-None-Match") == ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.send_header("ETag", ETAG)
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.seen = []
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def session(cache_dir, monkeypatch):
+    monkeypatch.setattr(http_cache, "ENABLED", True)
+    monkeypatch.setattr(http_cache, "CACHE_DIR", os.path.join(cache_dir, "http"))
+    with requests.Session() as s:
+        yield http_cache.install(s)
+
+
+def url_for(server, path="/page"):
+    return f"http://127.0.0.1:{server.server_port}{path}"
+
+
+def test_304_is_served_from_the_stored_body(server, session):
+    url = url_for(server)
+    first = session.get(url, timeout=5)
+    assert first.status_code == 200 and not first.from_cache
+
+    second = session.get(url, timeout=5)
+    assert server.seen == [None, ETAG]
+    assert second.status_code == 200
+    assert second.from_cache
+    assert second.content == BODY
+    assert second.text == BODY.decode()
+    assert second.headers["ETag"] == ETAG
+
+
+def test_304_refreshes_the_entry_for_eviction(server, session):
+    url = url_for(server)
+    session.get(url, timeout=5)
+    body_path = http_cache._entry_paths(url)[1]
+    os.utime(body_path, (0, 0))
+
+    session.get(url, timeout=5)
+    assert os.stat(body_path).st_mtime > 0
+
+
+def test_body_pruned_during_revalidation_is_a_miss(server, session, monkeypatch):
+    url = url_for(server)
+    session.get(url, timeout=5)
+
+    load = http_cache._load
+
+    def load_then_prune(u):
+        # The entry is loaded, then a concurrent prune deletes it before the 304
+        cached = load(u)
+        os.unlink(http_cache._entry_paths(u)[1])
+        return cached
+
+    monkeypatch.setattr(http_cache, "_load", load_then_prune)
+    resp = session.get(url, timeout=5)
+    assert server.seen == [None, ETAG, None]
+    assert resp.status_code == 200
+    assert not resp.from_cache
+    assert resp.content == BODY
+    # The full response was stored again
+    assert os.path.exists(http_cache._entry_paths(url)[1])
+
+
+def test_entries_are_keyed_by_full_url(server, session):
+    session.get(url_for(server, "/page?a=1"), timeout=5)
+    session.get(url_for(server, "/page?a=2"), timeout=5)
+    assert server.seen == [None, None]
+
+
+def test_prune_evicts_least_recently_used(session, monkeypatch):
+    os.makedirs(http_cache.CACHE_DIR)
+    for i, name in enumerate(["old", "new"]):
+        meta_path, body_path = http_cache._entry_paths(name)
+        for path in (meta_path, body_path):
+            with open(path, "wb") as f:
+                f.write(b"x" * 10)
+        os.utime(body_path, (i + 1, i + 1))
+    monkeypatch.setattr(http_cache, "MAX_AGE", float("inf"))
+    monkeypatch.setattr(http_cache, "MAX_BYTES", 10)
+
+    http_cache.prune()
+    assert not any(os.path.exists(p) for p in http_cache._entry_paths("old"))
+    assert all(os.path.exists(p) for p in http_cache._entry_paths("new"))
@@ -0,0 +1,127 @@
+import socket
+
+import pytest
+import requests
+
+import http_client
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+        # Off to act as callers that all arrive before any has slept
+        self.advance = True
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        if self.advance:
+            self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(http_client.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(http_client.time, "sleep", clock.sleep)
+    return clock
+
+
+def test_bucket_allows_a_burst_without_waiting(clock):
+    bucket = http_client.TokenBucket(rate=2, burst=3)
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.slept == []
+
+
+def test_bucket_sleeps_off_its_debt_in_order(clock):
+    bucket = http_client.TokenBucket(rate=2, burst=1)
+    bucket.acquire()
+    # Two callers arrive at once: the first waits one token, the second two
+    clock.advance = False
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.slept == [0.5, 1.0]
+
+
+def test_bucket_refills_at_its_rate_up_to_the_burst(clock):
+    bucket = http_client.TokenBucket(rate=2, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    clock.now += 60
+    for _ in range(2):
+        bucket.acquire()
+    assert clock.slept == []
+    bucket.acquire()
+    assert clock.slept == [0.5]
+
+
+def test_bucket_without_rate_never_waits(clock):
+    bucket = http_client.TokenBucket(rate=0, burst=1)
+    for _ in range(10):
+        bucket.acquire()
+    assert clock.slept == []
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = http_client.CircuitBreaker(threshold=3)
+    assert not breaker.failure()
+    assert not breaker.failure()
+    assert breaker.failure()
+    assert breaker.open
+    # Only the failure that tripped it reports the trip
+    assert not breaker.failure()
+
+
+def test_breaker_success_resets_the_count():
+    breaker = http_client.CircuitBreaker(threshold=2)
+    breaker.failure()
+    breaker.success()
+    assert not breaker.failure()
+    assert not breaker.open
+
+
+def test_breaker_stays_open_after_a_success():
+    breaker = http_client.CircuitBreaker(threshold=1)
+    breaker.failure()
+    breaker.success()
+    assert breaker.open
+
+
+def test_breaker_without_threshold_never_opens():
+    breaker = http_client.CircuitBreaker(threshold=0)
+    for _ in range(10):
+        breaker.failure()
+    assert not breaker.open
+
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_adapter_retries_then_trips_and_rejects(clock, monkeypatch):
+    monkeypatch.setattr(http_client, "RETRIES", 2)
+    monkeypatch.setattr(http_client, "BREAKER_FAILURES", 3)
+    monkeypatch.setattr(http_client, "_buckets", {})
+    monkeypatch.setattr(http_client, "_breakers", {})
+    url = f"http://127.0.0.1:{closed_port()}/"
+    with http_client.install(requests.Session()) as session:
+        with pytest.raises(requests.ConnectionError) as e:
+            session.get(url, timeout=5)
+        assert not isinstance(e.value, http_client.CircuitOpenError)
+        # Two backoffs between the three attempts
+        assert len(clock.slept) == 2
+
+        with pytest.raises(http_client.CircuitOpenError):
+            session.get(url, timeout=5)
+
+
+def test_timeouts_are_not_retried():
+    exc = requests.ConnectTimeout()
+    assert http_client.timed_out(exc)
+    assert not http_client.timed_out(requests.ConnectionError("reset"))
@@ -0,0 +1,90 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_client
+import image_probe
+
+IMAGE = b"\x89PNG" + b"\0" * 1230
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.server.seen.append(("HEAD", self.path, None))
+        self.send_response(200 if self.path != "/missing.png" else 404)
+        self.send_header("Content-Type", "image/png")
+        if self.path == "/sized.png":
+            self.send_header("Content-Length", str(len(IMAGE)))
+        else:
+            # No length, like a server that would compress the body on the fly
+            self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.seen.append(("GET", self.path, self.headers.get("Range")))
+        if self.path == "/missing.png":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/ranged.png":
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes 0-0/{len(IMAGE)}")
+            body = IMAGE[:1]
+        else:
+            self.send_response(200)
+            body = IMAGE
+        self.send_header("Content-Type", "image/png; charset=binary")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(http_client, "RETRIES", 0)
+    monkeypatch.setattr(http_client, "_buckets", {})
+    monkeypatch.setattr(http_client, "_breakers", {})
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    httpd.seen = []
+    threading.Thread(target=httpd.serve_forever, args=(0.01,), daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def url_for(server, path):
+    return f"http://127.0.0.1:{server.server_port}{path}"
+
+
+def test_head_length_is_used_when_reported(server):
+    assert image_probe.probe_url(url_for(server, "/sized.png")) == {"length": 1234, "type": "image/png"}
+    assert [method for method, _, _ in server.seen] == ["HEAD"]
+
+
+def test_falls_back_to_a_one_byte_ranged_get(server):
+    assert image_probe.probe_url(url_for(server, "/ranged.png")) == {"length": 1234, "type": "image/png"}
+    assert server.seen[1:] == [("GET", "/ranged.png", "bytes=0-0")]
+
+
+def test_range_ignored_uses_the_full_length(server):
+    assert image_probe.probe_url(url_for(server, "/plain.png")) == {"length": 1234, "type": "image/png"}
+
+
+def test_probe_caches_results_and_failures(server, monkeypatch):
+    monkeypatch.setattr(image_probe, "ENABLED", True)
+    probe = image_probe.ImageProbe(name="images.json")
+    urls = [url_for(server, "/sized.png"), url_for(server, "/missing.png")]
+    assert probe.probe(urls, workers=2) == 2
+    assert probe.describe(urls[0], "image/jpeg") == (1234, "image/png")
+    # A failed probe falls back, and isn't retried before RETRY_AFTER
+    assert probe.describe(urls[1], "image/jpeg") == (0, "image/jpeg")
+    assert probe.probe(urls) == 0
+    assert probe.describe(url_for(server, "/unseen.png"), "image/jpeg") == (0, "image/jpeg")
@@ -0,0 +1,78 @@
+import pytest
+
+import item_store
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(item_store.time, "time", lambda: now[0])
+    return now
+
+
+def make_store(**kwargs):
+    return item_store.ItemStore(
+        "items.json", guid=lambda item: item["id"], date=lambda item: item["date"], **kwargs
+    )
+
+
+def item(guid, date, title=""):
+    return {"id": guid, "date": date, "title": title}
+
+
+def ids(items):
+    return [i["id"] for i in items]
+
+
+def test_items_are_kept_after_leaving_the_page(clock):
+    store = make_store()
+    store.merge([item("a", "2024-01-02"), item("b", "2024-01-01")])
+    clock[0] += 60
+    merged = store.merge([item("c", "2024-01-03")])
+    assert ids(merged) == ["c", "a", "b"]
+
+
+def test_window_drops_the_oldest_items(clock):
+    store = make_store(window=3)
+    store.merge([item("a", "2024-01-02"), item("b", "2024-01-01")])
+    clock[0] += 60
+    merged = store.merge([item("c", "2024-01-04"), item("d", "2024-01-03")])
+    assert ids(merged) == ["c", "d", "a"]
+
+
+def test_this_runs_items_are_never_cut(clock):
+    store = make_store(window=2)
+    store.merge([item("new", "2024-02-01")])
+    clock[0] += 60
+    # An older-dated page is longer than the window; all of it is kept
+    page = [item("x", "2024-01-03"), item("y", "2024-01-02"), item("z", "2024-01-01")]
+    assert ids(store.merge(page)) == ["x", "y", "z"]
+
+
+def test_items_expire_after_max_age(clock):
+    store = make_store(max_age=3600)
+    store.merge([item("a", "2024-01-01")])
+    clock[0] += 3601
+    assert ids(store.merge([item("b", "2024-01-02")])) == ["b"]
+
+
+def test_date_ties_keep_page_order(clock):
+    store = make_store()
+    store.merge([item("b", "2024-01-01"), item("a", "2024-01-01")])
+    clock[0] += 60
+    page = [item("d", "2024-01-02"), item("c", "2024-01-02"), item("b", "2024-01-01"), item("a", "2024-01-01")]
+    assert ids(store.merge(page)) == ["d", "c", "b", "a"]
+
+
+def test_rescraped_item_replaces_the_stored_one(clock):
+    store = make_store()
+    store.merge([item("a", "2024-01-01", "old title")])
+    clock[0] += 60
+    assert store.merge([item("a", "2024-01-01", "new title")])[0]["title"] == "new title"
+
+
+def test_store_survives_between_runs(clock):
+    store = make_store()
+    store.merge([item("a", "2024-01-01")])
+    store.save()
+    assert ids(make_store().items()) == ["a"]
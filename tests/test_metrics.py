@@ -0,0 +1,29 @@
+import pytest
+import requests
+
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def fresh_metrics(monkeypatch):
+    monkeypatch.setattr(metrics, "_requests", [])
+
+
+def response(body, from_cache):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = body
+    resp.from_cache = from_cache
+    return resp
+
+
+def test_cache_hits_count_as_saved_not_transferred():
+    request = requests.Request("GET", "https://example.com/").prepare()
+    metrics.record_request("wire", request, response(b"x" * 100, False), 0.1)
+    metrics.record_request("wire", request, response(b"x" * 40, True), 0.01)
+
+    summary = metrics.build_report()["sources"]["wire"]
+    assert summary["requests"] == 2
+    assert summary["cache_hits"] == 1
+    assert summary["bytes"] == 100
+    assert summary["cached_bytes"] == 40
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+import rss_writer
+
+
+@pytest.fixture(autouse=True)
+def fresh_manifest(monkeypatch):
+    monkeypatch.setattr(rss_writer, "_manifest", None)
+
+
+def feed(items, build_date):
+    return rss_writer.iter_feed(
+        "Title", "https://example.com/", "Description",
+        "https://example.com/feed.xml", items, last_build_date=build_date,
+    )
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def test_unchanged_feed_keeps_its_build_date(tmp_path):
+    path = str(tmp_path / "feed.xml")
+    assert rss_writer.write_feed(path, feed(["<item>a</item>"], "Mon, 01 Jan 2024 00:00:00 +0000"))
+    first = read(path)
+
+    assert not rss_writer.write_feed(path, feed(["<item>a</item>"], "Tue, 02 Jan 2024 00:00:00 +0000"))
+    assert read(path) == first
+    assert not os.path.exists(path + rss_writer.TMP_SUFFIX)
+
+
+def test_changed_feed_gets_a_new_build_date(tmp_path):
+    path = str(tmp_path / "feed.xml")
+    rss_writer.write_feed(path, feed(["<item>a</item>"], "Mon, 01 Jan 2024 00:00:00 +0000"))
+
+    assert rss_writer.write_feed(path, feed(["<item>b</item>"], "Tue, 02 Jan 2024 00:00:00 +0000"))
+    text = read(path)
+    assert "<item>b</item>" in text
+    assert "<lastBuildDate>Tue, 02 Jan 2024 00:00:00 +0000</lastBuildDate>" in text
+
+
+def test_manifest_survives_between_runs(tmp_path, monkeypatch):
+    path = str(tmp_path / "feed.xml")
+    rss_writer.write_feed(path, feed(["<item>a</item>"], "Mon, 01 Jan 2024 00:00:00 +0000"))
+    rss_writer.save_manifest()
+
+    monkeypatch.setattr(rss_writer, "_manifest", None)
+    assert not rss_writer.write_feed(path, feed(["<item>a</item>"], "Tue, 02 Jan 2024 00:00:00 +0000"))
+
+
+def test_missing_file_is_restored_with_the_original_build_date(tmp_path):
+    path = str(tmp_path / "feed.xml")
+    rss_writer.write_feed(path, feed(["<item>a</item>"], "Mon, 01 Jan 2024 00:00:00 +0000"))
+    first = read(path)
+    os.unlink(path)
+
+    assert rss_writer.write_feed(path, feed(["<item>a</item>"], "Tue, 02 Jan 2024 00:00:00 +0000"))
+    assert read(path) == first
+
+
+def test_failed_write_leaves_no_temp_file(tmp_path):
+    path = str(tmp_path / "feed.xml")
+
+    def items():
+        yield "<item>a</item>"
+        raise RuntimeError("render failed")
+
+    with pytest.raises(RuntimeError):
+        rss_writer.write_feed(path, feed(items(), "Mon, 01 Jan 2024 00:00:00 +0000"))
+    assert os.listdir(tmp_path) == []
+
+
+def test_remove_temp_files(tmp_path):
+    (tmp_path / "feed.xml").write_text("feed")
+    (tmp_path / "cat.xml.tmp").write_text("partial")
+
+    rss_writer.remove_temp_files(str(tmp_path))
+    assert os.listdir(tmp_path) == ["feed.xml"]
@@ -0,0 +1,69 @@
+import pytest
+
+import scheduler
+
+T0 = 1_700_000_000.0
+HOUR = 3600
+
+
+@pytest.fixture
+def schedule(monkeypatch):
+    monkeypatch.setattr(scheduler, "ENABLED", True)
+    return scheduler.Scheduler(min_interval=HOUR / 2, max_interval=12 * HOUR)
+
+
+def next_interval(schedule, key, now):
+    return schedule._load()[key]["next"] - now
+
+
+def test_unknown_keys_are_due(schedule):
+    assert schedule.due("epw", now=T0)
+
+
+def test_first_refresh_is_a_baseline(schedule):
+    schedule.record("epw", ["a", "b"], now=T0)
+    assert next_interval(schedule, "epw", T0) == HOUR / 2
+    assert schedule._load()["epw"]["arrivals"] == []
+
+
+def test_interval_is_half_the_average_gap_between_arrivals(schedule):
+    schedule.record("epw", ["a"], now=T0)
+    # Two new items in 10 hours: one every 5 hours, refreshed every 2.5
+    schedule.record("epw", ["c", "b", "a"], now=T0 + 10 * HOUR)
+    assert next_interval(schedule, "epw", T0 + 10 * HOUR) == 2.5 * HOUR
+
+
+def test_quiet_key_waits_as_long_as_it_has_been_quiet(schedule):
+    schedule.record("epw", ["a"], now=T0)
+    schedule.record("epw", ["a"], now=T0 + 3 * HOUR)
+    assert next_interval(schedule, "epw", T0 + 3 * HOUR) == 3 * HOUR
+    schedule.record("epw", ["a"], now=T0 + 20 * HOUR)
+    assert next_interval(schedule, "epw", T0 + 20 * HOUR) == 12 * HOUR
+
+
+def test_busy_key_is_refreshed_at_the_minimum_interval(schedule):
+    schedule.record("wire:politics", ["a"], now=T0)
+    schedule.record("wire:politics", list("bcdefa"), now=T0 + HOUR)
+    assert next_interval(schedule, "wire:politics", T0 + HOUR) == HOUR / 2
+
+
+def test_due_allows_for_cron_drift(schedule):
+    schedule.record("epw", ["a"], now=T0)
+    schedule.record("epw", ["a"], now=T0 + 3 * HOUR)
+    due_at = T0 + 6 * HOUR
+    assert not schedule.due("epw", now=due_at - scheduler.EARLY - 1)
+    assert schedule.due("epw", now=due_at - scheduler.EARLY)
+
+
+def test_everything_is_due_when_disabled(schedule, monkeypatch):
+    schedule.record("epw", ["a"], now=T0)
+    monkeypatch.setattr(scheduler, "ENABLED", False)
+    assert schedule.due("epw", now=T0)
+
+
+def test_result_and_schedule_survive_between_runs(schedule):
+    schedule.record("epw", ["a"], result={"items": 1}, now=T0)
+    schedule.save()
+    again = scheduler.Scheduler()
+    assert again.result("epw") == {"items": 1}
+    assert not again.due("epw", now=T0)
@@ -0,0 +1,47 @@
+"""Per-host concurrency limits for polite scraping.
+
+The request rate per host is limited for every session by http_client's
+token buckets.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+import budget
+
+MAX_PER_HOST = max(1, int(os.environ.get("SCRAPE_CONCURRENCY", "4")))
+
+
+class HostLimiter:
+    """Allow at most ``max_per_host`` requests in flight per host."""
+
+    def __init__(self, max_per_host=MAX_PER_HOST):
+        self.max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._slots = {}
+
+    @contextmanager
+    def slot(self, url, source=None):
+        """Hold one of the host's slots. With ``source``, raise BudgetExceeded
+        instead if the budget ran out for it while waiting for the slot."""
+        host = urlsplit(url).netloc
+        with self._lock:
+            sem = self._slots.setdefault(host, threading.Semaphore(self.max_per_host))
+        with sem:
+            if source is not None and budget.expired(source=source):
+                raise budget.BudgetExceeded()
+            yield
+
+
+LIMITER = HostLimiter()
+
+
+def map_ordered(func, items, workers=MAX_PER_HOST):
+    """Run ``func`` over ``items`` in a thread pool, returning results in input order."""
+    if workers <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(func, items))